@@ -12,6 +12,7 @@ class Config:
     
     _instance = None
     _config_data = None
+    _revision = 0
     
     def __new__(cls):
         """Singleton pattern - only one config instance"""
@@ -23,6 +24,7 @@ class Config:
     def _load_config(self):
         """Load configuration from config.json"""
         config_path = Path(__file__).parent / "config.json"
+        self._revision += 1
         
         try:
             with open(config_path, 'r') as f:
@@ -38,6 +40,10 @@ class Config:
         """Reload configuration from disk"""
         self._load_config()
     
+    def get_revision(self):
+        """Get a counter that changes every time the configuration is (re)loaded"""
+        return self._revision
+    
     def _get_defaults(self):
         """Return default configuration if file is not found"""
         return {
@@ -76,6 +82,9 @@ class Config:
             "features": {
                 "snap_to_grid_enabled": False,
                 "antialiasing_enabled": True
+            },
+            "history": {
+                "undo_limit": 200
             }
         }
     
@@ -193,6 +202,10 @@ class Config:
     def is_antialiasing_enabled(self):
         """Get whether antialiasing is enabled"""
         return self.get('features.antialiasing_enabled', True)
+    
+    def get_undo_limit(self):
+        """Get maximum number of undo steps kept in history"""
+        return self.get('history.undo_limit', 200) or 200
 
 
 # Convenient function to get config instance
@@ -2,6 +2,7 @@
 Undo/Redo actions for the wire diagram maker
 """
 
+import time
 from PyQt5.QtCore import QPoint
 from PyQt5.QtGui import QColor
 
@@ -10,17 +11,21 @@ class Action:
     """Base class for undoable/redoable actions"""
 
     def execute(self):
-        """Execute the action"""
+        """Execute the action; may return False if it changed nothing"""
         raise NotImplementedError
 
     def undo(self):
-        """Undo the action"""
+        """Undo the action; may return False if it changed nothing"""
         raise NotImplementedError
 
     def get_description(self):
         """Get a description of the action for the UI"""
         raise NotImplementedError
 
+    def merge(self, action):
+        """Fold a following action into this one; returns True if it was merged"""
+        return False
+
 
 class AddNodeAction(Action):
     """Action for adding a node"""
@@ -31,18 +36,20 @@ class AddNodeAction(Action):
 
     def execute(self):
         """Add the node to the canvas"""
-        if self.node not in self.canvas.nodes:
-            self.canvas.nodes.append(self.node)
+        if self.node in self.canvas.nodes:
+            return False
+        self.canvas.nodes.append(self.node)
 
     def undo(self):
         """Remove the node from the canvas"""
-        if self.node in self.canvas.nodes:
-            self.canvas.nodes.remove(self.node)
-            # Remove any connections involving this node
-            self.canvas.connections = [
-                conn for conn in self.canvas.connections
-                if conn.node1 != self.node and conn.node2 != self.node
-            ]
+        if self.node not in self.canvas.nodes:
+            return False
+        self.canvas.nodes.remove(self.node)
+        # Remove any connections involving this node
+        self.canvas.connections = [
+            conn for conn in self.canvas.connections
+            if conn.node1 is not self.node and conn.node2 is not self.node
+        ]
 
     def get_description(self):
         return f"Add node {self.node.name}"
@@ -58,27 +65,31 @@ class DeleteNodeAction(Action):
 
     def execute(self):
         """Remove the node and its connections"""
-        if self.node in self.canvas.nodes:
-            # Store all connections to restore on undo
-            self.connections = [
-                conn for conn in self.canvas.connections
-                if conn.node1 == self.node or conn.node2 == self.node
-            ]
-            # Remove the node
-            self.canvas.nodes.remove(self.node)
-            # Remove connections
-            for conn in self.connections:
-                if conn in self.canvas.connections:
-                    self.canvas.connections.remove(conn)
+        if self.node not in self.canvas.nodes:
+            return False
+        # Split the connections in one pass: the node's ones are stored to restore on undo
+        self.connections = []
+        remaining = []
+        for conn in self.canvas.connections:
+            if conn.node1 is self.node or conn.node2 is self.node:
+                self.connections.append(conn)
+            else:
+                remaining.append(conn)
+        # Remove the node
+        self.canvas.nodes.remove(self.node)
+        # Remove connections
+        self.canvas.connections = remaining
 
     def undo(self):
         """Restore the node and its connections"""
+        present = set(self.canvas.connections)
+        missing = [conn for conn in self.connections if conn not in present]
+        if self.node in self.canvas.nodes and not missing:
+            return False
         if self.node not in self.canvas.nodes:
             self.canvas.nodes.append(self.node)
         # Restore connections
-        for conn in self.connections:
-            if conn not in self.canvas.connections:
-                self.canvas.connections.append(conn)
+        self.canvas.connections.extend(missing)
 
     def get_description(self):
         return f"Delete node {self.node.name}"
@@ -93,13 +104,15 @@ class AddConnectionAction(Action):
 
     def execute(self):
         """Add the connection to the canvas"""
-        if self.connection not in self.canvas.connections:
-            self.canvas.connections.append(self.connection)
+        if self.connection in self.canvas.connections:
+            return False
+        self.canvas.connections.append(self.connection)
 
     def undo(self):
         """Remove the connection from the canvas"""
-        if self.connection in self.canvas.connections:
-            self.canvas.connections.remove(self.connection)
+        if self.connection not in self.canvas.connections:
+            return False
+        self.canvas.connections.remove(self.connection)
 
     def get_description(self):
         return f"Add connection {self.connection.node1.name} -> {self.connection.node2.name}"
@@ -114,13 +127,15 @@ class DeleteConnectionAction(Action):
 
     def execute(self):
         """Remove the connection"""
-        if self.connection in self.canvas.connections:
-            self.canvas.connections.remove(self.connection)
+        if self.connection not in self.canvas.connections:
+            return False
+        self.canvas.connections.remove(self.connection)
 
     def undo(self):
         """Restore the connection"""
-        if self.connection not in self.canvas.connections:
-            self.canvas.connections.append(self.connection)
+        if self.connection in self.canvas.connections:
+            return False
+        self.canvas.connections.append(self.connection)
 
     def get_description(self):
         return f"Delete connection {self.connection.node1.name} -> {self.connection.node2.name}"
@@ -138,12 +153,10 @@ class MoveNodeAction(Action):
     def execute(self):
         """Move the node to the new position"""
         self.node.pos = QPoint(self.new_pos)
-        self.node.update_rect()
 
     def undo(self):
         """Move the node back to the old position"""
         self.node.pos = QPoint(self.old_pos)
-        self.node.update_rect()
 
     def get_description(self):
         return f"Move node {self.node.name}"
@@ -225,13 +238,15 @@ class AddImageAction(Action):
 
     def execute(self):
         """Add the image to the canvas"""
-        if self.image not in self.canvas.images:
-            self.canvas.images.append(self.image)
+        if self.image in self.canvas.images:
+            return False
+        self.canvas.images.append(self.image)
 
     def undo(self):
         """Remove the image from the canvas"""
-        if self.image in self.canvas.images:
-            self.canvas.images.remove(self.image)
+        if self.image not in self.canvas.images:
+            return False
+        self.canvas.images.remove(self.image)
 
     def get_description(self):
         return f"Add image"
@@ -246,13 +261,15 @@ class DeleteImageAction(Action):
 
     def execute(self):
         """Remove the image"""
-        if self.image in self.canvas.images:
-            self.canvas.images.remove(self.image)
+        if self.image not in self.canvas.images:
+            return False
+        self.canvas.images.remove(self.image)
 
     def undo(self):
         """Restore the image"""
-        if self.image not in self.canvas.images:
-            self.canvas.images.append(self.image)
+        if self.image in self.canvas.images:
+            return False
+        self.canvas.images.append(self.image)
 
     def get_description(self):
         return f"Delete image"
@@ -317,9 +334,9 @@ class CreateModuleAction(Action):
         self.images = images
         self.module_id = module_id
         # Store original state
-        self.original_locked = {node: getattr(node, 'locked', False) for node in nodes}
-        self.original_module_ids = {node: getattr(node, 'module_id', None) for node in nodes}
-        self.image_module_ids = {image: getattr(image, 'module_instance_id', None) for image in images}
+        self.original_locked = {node: node.locked for node in nodes}
+        self.original_module_ids = {node: node.module_id for node in nodes}
+        self.image_module_ids = {image: image.module_instance_id for image in images}
 
     def execute(self):
         """Lock nodes and images as part of the module"""
@@ -347,50 +364,92 @@ class CreateModuleAction(Action):
 class MoveModuleAction(Action):
     """Action for moving an entire module (all nodes and images together)"""
 
-    def __init__(self, canvas, module_id, nodes, images, old_positions, new_positions):
+    def __init__(self, canvas, module_id, nodes, images, delta, old_waypoints, new_waypoints):
         self.canvas = canvas
         self.module_id = module_id
         self.nodes = nodes
         self.images = images
-        self.old_node_positions = old_positions["nodes"]  # Dict: node -> QPoint
-        self.new_node_positions = new_positions["nodes"]
-        self.old_image_positions = old_positions["images"]  # Dict: image -> QPoint
-        self.new_image_positions = new_positions["images"]
-        # Handle waypoints for backward compatibility with old files
-        self.old_waypoints = old_positions.get("waypoints", {})  # Dict: connection -> list of QPoint
-        self.new_waypoints = new_positions.get("waypoints", {})
+        # Every member moves by the same offset, so one delta covers both directions
+        self.delta = QPoint(delta)
+        self.old_waypoints = old_waypoints  # Dict: connection -> list of QPoint
+        self.new_waypoints = new_waypoints
+        self.applied = True  # The drag has already moved the members when the action is created
+
+    def _translate(self, delta):
+        """Move every node and image of the module by an offset"""
+        # Assign new points: the canvas translates element positions in place while dragging
+        for node in self.nodes:
+            node.pos = node.pos + delta
+        for image in self.images:
+            image.pos = image.pos + delta
 
     def execute(self):
         """Move all nodes and images to their new positions"""
-        for node, pos in self.new_node_positions.items():
-            node.pos = pos
-        for image, pos in self.new_image_positions.items():
-            image.pos = pos
-        # Restore waypoints to their new positions (if available)
-        if hasattr(self, 'new_waypoints') and self.new_waypoints:
-            for connection, waypoints in self.new_waypoints.items():
-                connection.waypoints = [QPoint(wp) for wp in waypoints]
+        if self.applied:
+            return False
+        self._translate(self.delta)
+        self.applied = True
+        # Restore waypoints to their new positions
+        for connection, waypoints in self.new_waypoints.items():
+            connection.waypoints = [QPoint(wp) for wp in waypoints]
 
     def undo(self):
         """Restore all nodes and images to their old positions"""
-        print(f"DEBUG UNDO: MoveModuleAction.undo() called")
-        for node, pos in self.old_node_positions.items():
-            node.pos = pos
-        for image, pos in self.old_image_positions.items():
-            image.pos = pos
-        # Restore waypoints to their old positions (if available)
-        if hasattr(self, 'old_waypoints') and self.old_waypoints:
-            print(f"DEBUG UNDO: Restoring {len(self.old_waypoints)} connections with waypoints")
-            for connection, waypoints in self.old_waypoints.items():
-                print(f"DEBUG UNDO: Connection {id(connection)}: restoring {len(waypoints)} waypoints")
-                connection.waypoints = [QPoint(wp) for wp in waypoints]
-        else:
-            print(f"DEBUG UNDO: No waypoints to restore (old_waypoints={getattr(self, 'old_waypoints', 'N/A')})")
+        if not self.applied:
+            return False
+        self._translate(-self.delta)
+        self.applied = False
+        # Restore waypoints to their old positions
+        for connection, waypoints in self.old_waypoints.items():
+            connection.waypoints = [QPoint(wp) for wp in waypoints]
 
     def get_description(self):
         return f"Move module"
 
 
+class RotateModuleAction(Action):
+    """Action for rotating a module by one or more quarter turns"""
+
+    merge_window = 0.3  # Seconds within which repeated rotations become one undo step
+
+    def __init__(self, canvas, module_id, old_state, new_state):
+        self.canvas = canvas
+        self.module_id = module_id
+        # Dict: node or image -> (x, y, rotation), with rotation None for nodes
+        self.old_state = old_state
+        self.new_state = new_state
+        self.timestamp = time.monotonic()
+
+    def _apply(self, state):
+        """Put every member back at a recorded position and rotation"""
+        for element, (x, y, rotation) in state.items():
+            element.pos = QPoint(x, y)
+            if rotation is not None:
+                # Only images have a rotation and a cached rect
+                element.rotation = rotation
+                element.update_rect()
+
+    def execute(self):
+        """Rotate the module to its new orientation"""
+        self._apply(self.new_state)
+
+    def undo(self):
+        """Rotate the module back to its old orientation"""
+        self._apply(self.old_state)
+
+    def merge(self, action):
+        """Combine with a rotation of the same module made shortly afterwards"""
+        if (not isinstance(action, RotateModuleAction) or action.module_id != self.module_id
+                or action.timestamp - self.timestamp > self.merge_window):
+            return False
+        self.new_state = action.new_state
+        self.timestamp = action.timestamp
+        return True
+
+    def get_description(self):
+        return f"Rotate module"
+
+
 class DuplicateModuleAction(Action):
     """Action for duplicating a module with all its nodes, images, and connections"""
 
@@ -460,21 +519,18 @@ class DeleteModuleAction(Action):
         print(f"[DEBUG DeleteModuleAction.execute] Removing entire module '{self.module_id}'")
         
         # Remove connections first (to avoid dangling references)
-        for connection in self.connections:
-            if connection in self.canvas.connections:
-                self.canvas.connections.remove(connection)
+        doomed = set(self.connections)
+        self.canvas.connections = [conn for conn in self.canvas.connections if conn not in doomed]
         print(f"  ✓ Removed {len(self.connections)} connections")
         
         # Remove nodes
-        for node in self.nodes:
-            if node in self.canvas.nodes:
-                self.canvas.nodes.remove(node)
+        doomed = set(self.nodes)
+        self.canvas.nodes = [node for node in self.canvas.nodes if node not in doomed]
         print(f"  ✓ Removed {len(self.nodes)} nodes")
         
         # Remove images
-        for image in self.images:
-            if image in self.canvas.images:
-                self.canvas.images.remove(image)
+        doomed = set(self.images)
+        self.canvas.images = [image for image in self.canvas.images if image not in doomed]
         print(f"  ✓ Removed {len(self.images)} images")
 
     def undo(self):
@@ -482,21 +538,18 @@ class DeleteModuleAction(Action):
         print(f"[DEBUG DeleteModuleAction.undo] Restoring entire module '{self.module_id}'")
         
         # Restore nodes first
-        for node in self.nodes:
-            if node not in self.canvas.nodes:
-                self.canvas.nodes.append(node)
+        present = set(self.canvas.nodes)
+        self.canvas.nodes.extend(node for node in self.nodes if node not in present)
         print(f"  ✓ Restored {len(self.nodes)} nodes")
         
         # Restore images
-        for image in self.images:
-            if image not in self.canvas.images:
-                self.canvas.images.append(image)
+        present = set(self.canvas.images)
+        self.canvas.images.extend(image for image in self.images if image not in present)
         print(f"  ✓ Restored {len(self.images)} images")
         
         # Restore connections last (after all nodes exist)
-        for connection in self.connections:
-            if connection not in self.canvas.connections:
-                self.canvas.connections.append(connection)
+        present = set(self.canvas.connections)
+        self.canvas.connections.extend(conn for conn in self.connections if conn not in present)
         print(f"  ✓ Restored {len(self.connections)} connections")
         
         # Restore selection if this module was selected
@@ -521,13 +574,15 @@ class AddWaypointAction(Action):
 
     def execute(self):
         """Add the waypoint to the connection"""
-        if self.index <= len(self.connection.waypoints):
-            self.connection.waypoints.insert(self.index, self.waypoint)
+        if self.index > len(self.connection.waypoints):
+            return False
+        self.connection.waypoints.insert(self.index, self.waypoint)
 
     def undo(self):
         """Remove the waypoint from the connection"""
-        if self.index < len(self.connection.waypoints) and self.connection.waypoints[self.index] == self.waypoint:
-            self.connection.waypoints.pop(self.index)
+        if self.index >= len(self.connection.waypoints) or self.connection.waypoints[self.index] != self.waypoint:
+            return False
+        self.connection.waypoints.pop(self.index)
 
     def get_description(self):
         return f"Add waypoint to connection"
@@ -544,13 +599,15 @@ class RemoveWaypointAction(Action):
 
     def execute(self):
         """Remove the waypoint from the connection"""
-        if self.index < len(self.connection.waypoints) and self.connection.waypoints[self.index] == self.waypoint:
-            self.connection.waypoints.pop(self.index)
+        if self.index >= len(self.connection.waypoints) or self.connection.waypoints[self.index] != self.waypoint:
+            return False
+        self.connection.waypoints.pop(self.index)
 
     def undo(self):
         """Restore the waypoint to the connection"""
-        if self.index <= len(self.connection.waypoints):
-            self.connection.waypoints.insert(self.index, self.waypoint)
+        if self.index > len(self.connection.waypoints):
+            return False
+        self.connection.waypoints.insert(self.index, self.waypoint)
 
     def get_description(self):
         return f"Remove waypoint from connection"
@@ -2,19 +2,39 @@
 Canvas widget for drawing wire diagrams
 """
 
+import io
+import json
 import math
-from PyQt5.QtWidgets import QWidget, QMenu
-from PyQt5.QtCore import Qt, QPoint, QRect, pyqtSignal
-from PyQt5.QtGui import QPainter, QPen, QBrush, QColor, QFont
-from diagram_elements import Node, Connection, Image
-from diagram_actions import AddNodeAction, AddConnectionAction, DeleteNodeAction, DeleteConnectionAction, AddImageAction, DeleteImageAction, MoveImageAction, ResizeImageAction, MoveModuleAction, AddWaypointAction, RemoveWaypointAction, DuplicateModuleAction, DeleteModuleAction
+import re
+from collections import deque
+from contextlib import contextmanager
+from PyQt5.QtWidgets import QApplication, QWidget, QMenu
+from PyQt5.QtCore import Qt, QPoint, QPointF, QRect, QRectF, QTimer, pyqtSignal
+from PyQt5.QtGui import QPainter, QPainterPath, QPen, QBrush, QColor, QFont, QPixmap, QRegion, QTransform
+from diagram_elements import Node, Connection, Image, get_color
+from diagram_actions import AddNodeAction, AddConnectionAction, DeleteNodeAction, DeleteConnectionAction, AddImageAction, DeleteImageAction, MoveImageAction, ResizeImageAction, MoveModuleAction, RotateModuleAction, AddWaypointAction, RemoveWaypointAction, DuplicateModuleAction, DeleteModuleAction
 from properties_dialog import NodePropertiesDialog
 from config_loader import get_config
+from spatial_index import SpatialHash
+
+
+# Matches auto-generated node names so the counter can resume after them
+_NODE_NUM_RE = re.compile(r'^Node(\d+)$')
 
 
 class DiagramCanvas(QWidget):
     """Canvas for drawing and managing diagram elements"""
 
+    # Maximum number of pre-rendered node pixmaps kept at once
+    NODE_PIXMAP_CACHE_LIMIT = 256
+
+    # Extra canvas-space margin repainted around moved elements; covers the
+    # selected module's box, which is padded 10px beyond its members
+    DAMAGE_MARGIN = 12
+
+    # Minimum width in device pixels of the pre-rendered grid tile
+    GRID_TILE_MIN_SIZE = 128
+
     # Signals
     tool_deactivated = pyqtSignal()  # Emitted when a tool action is completed
     selection_changed = pyqtSignal()  # Emitted when selection changes
@@ -48,6 +68,7 @@ class DiagramCanvas(QWidget):
         # For dragging nodes
         self.dragging_node = None
         self.drag_offset = QPoint()
+        self._drag_moved = False  # Whether the current drag changed any geometry
 
         # For dragging and resizing images
         self.dragging_image = None
@@ -59,6 +80,7 @@ class DiagramCanvas(QWidget):
         
         # For tracking module movement
         self.dragging_module = None
+        self.module_drag_press_pos = QPoint()  # Screen position the module drag started from
         self.module_drag_start_positions = {}  # {node: start_pos, ...}
         self.module_drag_start_image_positions = {}  # {image: start_pos, ...}
         self.module_drag_start_waypoints = {}  # {connection: [waypoints], ...}
@@ -74,25 +96,56 @@ class DiagramCanvas(QWidget):
         self.show_grid = config.get_grid_enabled_by_default()
         self.grid_size = config.get_grid_size()
         self.snap_to_grid = config.is_snap_to_grid_enabled_by_default()
+        self._grid_tile = None  # A pre-rendered block of grid cells, tiled across the view
+        self._grid_tile_key = None  # (grid_size, cells, scale, grid_color) the tile was built for
+        self._node_pixmap_cache = {}  # Pre-rendered nodes keyed by (style, scale)
+        self._connection_styles = {}  # {rgba: (line pen, end point pen, end point brush)}
+
+        # Config values read while painting, refreshed in refresh_from_config
+        self._grid_color = config.get_grid_color()
+        self._antialiasing = config.is_antialiasing_enabled()
+        self._hitbox_distance = config.get_connection_hitbox_distance()
+        self._class_color_cache = {}  # {class_name: (r, g, b)}
 
         # Pan/zoom settings
         self.pan_offset = QPoint(0, 0)
         self.panning = False
         self.pan_start = QPoint()
         self.zoom_level = 1.0
+        self._inv_zoom = 1.0  # 1 / zoom_level, kept in step by set_zoom
         self.min_zoom = config.get_zoom_min()
         self.max_zoom = config.get_zoom_max()
         self.zoom_increment = config.get_zoom_increment()
+        self._view_transform = QTransform()  # Combined pan + zoom, rebuilt when either changes
+        self._view_transform_inverse = QTransform()
+        self._view_transform_key = (0, 0, 1.0)
 
         # Selection settings
-        self.selected_nodes = []
-        self.selected_connections = []
+        # Dicts used as insertion-ordered sets for O(1) membership and removal
+        self.selected_nodes = {}
+        self.selected_connections = {}
         self.selected_module_id = None  # Track the currently selected module
         
         # Module edit mode
         self.module_edit_mode = False  # True when editing a module
         self.module_being_edited = None  # ID of the module being edited
-        self.module_edit_original_positions = {}  # Store original positions for cancel: {node/image: pos}
+        self.module_edit_original_positions = {}  # Store original positions for cancel: {node/image: (x, y)}
+        
+        # Mouse moves are applied at most once per frame (~60 Hz)
+        self._pending_move_pos = None
+        self._move_timer = QTimer(self)
+        self._move_timer.setSingleShot(True)
+        self._move_timer.setInterval(16)
+        self._move_timer.timeout.connect(self._flush_move)
+        
+        # Context menus are built on first use and reused afterwards
+        self._node_menu = None
+        self._connection_menu = None
+        self._module_menu = None
+        self._context_node = None  # Targets of the menu currently being shown
+        self._context_connection = None
+        self._context_pos = None
+        self._context_module_id = None
         
         # Connection routing mode
         self.orthogonal_routing = False  # True for H/V routing, False for direct lines
@@ -100,9 +153,36 @@ class DiagramCanvas(QWidget):
         # Flag to prevent individual delete actions during module deletion
         self._deleting_module = False
 
-        # Undo/Redo stacks
-        self.undo_stack = []
-        self.redo_stack = []
+        # Last rendering of the scene, reused until update() marks all or part of it dirty
+        self._scene_cache = None
+        self._scene_dirty = True
+        self._dirty_region = QRegion()  # Widget-space areas to re-render on the next paint
+
+        # Repaints, modification and selection signals held back inside batch_updates()
+        self._batch_depth = 0
+        self._pending_update = False
+        self._pending_modified = False
+        self._pending_selection_changed = False
+
+        # Cached {module_id: ([nodes], [images])}, rebuilt lazily after edits
+        self._module_index = None
+
+        # Spatial hashes of element bounds plus each element's list position,
+        # rebuilt lazily after edits and kept current incrementally while dragging
+        self._node_grid = None
+        self._node_order = {}
+        self._connection_grid = None
+        self._connection_order = {}
+        self._image_grid = None
+        self._image_order = {}
+
+        # Cached {node: [connections attached to it]}, rebuilt lazily after edits
+        self._node_connections = None
+
+        # Undo/Redo stacks, capped at the configured undo limit (oldest entries are dropped)
+        undo_limit = config.get_undo_limit()
+        self.undo_stack = deque(maxlen=undo_limit)
+        self.redo_stack = deque(maxlen=undo_limit)
 
         # Default colors and class for new elements
         default_node_color = config.get_node_default_color()
@@ -146,13 +226,13 @@ class DiagramCanvas(QWidget):
         """Snap a position to the nearest grid point"""
         if not self.snap_to_grid:
             return pos
-        # Get x and y coordinates as floats
-        x = pos.x() if isinstance(pos, QPoint) else pos[0]
-        y = pos.y() if isinstance(pos, QPoint) else pos[1]
-        # Round to nearest grid point
-        snapped_x = round(x / self.grid_size) * self.grid_size
-        snapped_y = round(y / self.grid_size) * self.grid_size
-        return QPoint(int(snapped_x), int(snapped_y))
+        # Round to the nearest grid point in integer math (halves round up)
+        size = max(int(self.grid_size), 1)
+        half = size // 2
+        return QPoint(
+            (pos.x() + half) // size * size,
+            (pos.y() + half) // size * size
+        )
 
     def zoom_in(self):
         """Increase zoom level"""
@@ -171,42 +251,174 @@ class DiagramCanvas(QWidget):
     def set_zoom(self, zoom_level):
         """Set the zoom level"""
         self.zoom_level = max(self.min_zoom, min(zoom_level, self.max_zoom))
+        self._inv_zoom = 1.0 / self.zoom_level
+        self.update()
+
+    def set_pan_offset(self, pan_offset):
+        """Set the pan offset"""
+        self.pan_offset = QPoint(pan_offset)
         self.update()
 
+    def get_view_transform(self):
+        """Get the canvas-to-screen transform for the current pan and zoom"""
+        key = (self.pan_offset.x(), self.pan_offset.y(), self.zoom_level)
+        if key != self._view_transform_key:
+            self._view_transform = QTransform(self.zoom_level, 0, 0, self.zoom_level, key[0], key[1])
+            self._view_transform_inverse = self._view_transform.inverted()[0]
+            self._view_transform_key = key
+        return self._view_transform
+
+    def invalidate_indexes(self):
+        """Drop cached lookup tables after elements are added, removed, moved or regrouped"""
+        self._module_index = None
+        self._node_connections = None
+        self._node_grid = None
+        self._connection_grid = None
+        self._image_grid = None
+        for connection in self.connections:
+            connection.invalidate_bounds()
+
+    def get_node_connections(self, node):
+        """Get the connections attached to a node"""
+        if self._node_connections is None:
+            adjacency = {}
+            for connection in self.connections:
+                adjacency.setdefault(connection.node1, []).append(connection)
+                if connection.node2 is not connection.node1:
+                    adjacency.setdefault(connection.node2, []).append(connection)
+            self._node_connections = adjacency
+        return self._node_connections.get(node, ())
+
+    def _connections_of(self, nodes):
+        """Get the distinct connections attached to any of the given nodes"""
+        attached = {}
+        for node in nodes:
+            for connection in self.get_node_connections(node):
+                attached[connection] = None
+        return attached
+
+    def _build_spatial_indexes(self):
+        """Build the spatial hashes of node, connection and image bounds"""
+        cell_size = max(self.grid_size, 1) * 4
+        self._node_grid, self._node_order = self._index_bounds(self.nodes, cell_size)
+        self._connection_grid, self._connection_order = self._index_bounds(self.connections, cell_size)
+        self._image_grid, self._image_order = self._index_bounds(self.images, cell_size)
+
+    @staticmethod
+    def _index_bounds(items, cell_size):
+        """Build a spatial hash of the items' bounds and a map of their list positions"""
+        grid = SpatialHash(cell_size)
+        for item in items:
+            grid.insert(item, item.get_bounding_rect())
+        return grid, {item: i for i, item in enumerate(items)}
+
+    @staticmethod
+    def _items_in_rect(grid, order, rect):
+        """Get the indexed items whose bounds intersect a rectangle, in list order"""
+        # Use the bounds stored at index time rather than recomputing each candidate's
+        items = grid.intersecting(rect)
+        if len(items) == len(order):
+            # Everything is in view (e.g. zoomed out): the order map already lists them in order
+            return list(order)
+        items.sort(key=order.__getitem__)
+        return items
+
+    def get_nodes_in_rect(self, rect):
+        """Get the nodes whose bounds intersect a canvas rectangle, in list order"""
+        if self._node_grid is None:
+            self._build_spatial_indexes()
+        return self._items_in_rect(self._node_grid, self._node_order, rect)
+
+    def get_connections_in_rect(self, rect):
+        """Get the connections whose bounds intersect a canvas rectangle, in list order"""
+        if self._node_grid is None:
+            self._build_spatial_indexes()
+        return self._items_in_rect(self._connection_grid, self._connection_order, rect)
+
+    def get_images_in_rect(self, rect):
+        """Get the images whose bounds intersect a canvas rectangle, in list order"""
+        if self._node_grid is None:
+            self._build_spatial_indexes()
+        return self._items_in_rect(self._image_grid, self._image_order, rect)
+
+    def _reindex_moved(self, nodes=(), images=(), connections=()):
+        """Update cached connection bounds and the spatial hashes after elements moved"""
+        # Connections follow their end nodes
+        moved_connections = self._connections_of(nodes)
+        moved_connections.update(dict.fromkeys(connections))
+        for connection in moved_connections:
+            connection.invalidate_bounds()
+        
+        if self._node_grid is None:
+            return
+        for node in nodes:
+            self._node_grid.update(node, node.get_bounding_rect())
+        for image in images:
+            self._image_grid.update(image, image.get_bounding_rect())
+        for connection in moved_connections:
+            self._connection_grid.update(connection, connection.get_bounding_rect())
+
+    def _get_module_index(self):
+        """Get the cached {module_id: ([nodes], [images])} map, rebuilding it if needed"""
+        if self._module_index is None:
+            index = {}
+            for node in self.nodes:
+                if node.module_id:
+                    index.setdefault(node.module_id, ([], []))[0].append(node)
+            for image in self.images:
+                if image.module_instance_id:
+                    index.setdefault(image.module_instance_id, ([], []))[1].append(image)
+            self._module_index = index
+        return self._module_index
+
+    def get_module_members(self, module_id):
+        """Get the (nodes, images) that belong to a module instance"""
+        return self._get_module_index().get(module_id, ([], []))
+
+    def get_next_instance_number(self, base_module_id):
+        """Get the next unused instance number for a module placed on the canvas"""
+        # Scan the distinct module ids rather than every node
+        prefix = f"{base_module_id}_inst_"
+        max_instance = 0
+        for module_id in self._get_module_index():
+            if module_id.startswith(prefix):
+                try:
+                    max_instance = max(max_instance, int(module_id[len(prefix):]))
+                except ValueError:
+                    pass
+        return max_instance + 1
+
     def screen_to_canvas(self, screen_pos):
         """Convert screen coordinates to canvas coordinates"""
-        return (screen_pos - self.pan_offset) / self.zoom_level
+        return (screen_pos - self.pan_offset) * self._inv_zoom
 
-    def _setup_module_drag(self, module_id, drag_offset):
-        """Setup module dragging - capture all positions and waypoints"""
+    def screen_to_canvas_rect(self, screen_rect):
+        """Convert a screen rectangle to a canvas rectangle"""
+        self.get_view_transform()
+        return self._view_transform_inverse.mapRect(QRectF(screen_rect))
+
+    def _setup_module_drag(self, module_id, drag_offset, press_pos):
+        """Setup module dragging - positions are captured once the pointer passes the drag threshold"""
         self.dragging_module = module_id
-        # Store initial positions of all module nodes
+        self.module_drag_press_pos = QPoint(press_pos)
         self.module_drag_start_positions = {}
-        for node in self.nodes:
-            if hasattr(node, 'module_id') and node.module_id == module_id:
-                self.module_drag_start_positions[node] = QPoint(node.pos)
-        # Store initial positions of all module images
         self.module_drag_start_image_positions = {}
-        for image in self.images:
-            if hasattr(image, 'module_instance_id') and image.module_instance_id == module_id:
-                self.module_drag_start_image_positions[image] = QPoint(image.pos)
+        self.module_drag_start_waypoints = {}
+
+    def _snapshot_module_drag(self, module_nodes, module_images):
+        """Capture the start positions and waypoints of a module drag for undo/redo"""
+        # Store initial positions of all module nodes
+        self.module_drag_start_positions = {node: QPoint(node.pos) for node in module_nodes}
+        # Store initial positions of all module images
+        self.module_drag_start_image_positions = {image: QPoint(image.pos) for image in module_images}
         # Store initial waypoint positions for all connections related to this module
         self.module_drag_start_waypoints = {}
-        # Get all nodes in this module
-        module_nodes_set = set()
-        for node in self.nodes:
-            if hasattr(node, 'module_id') and node.module_id == module_id:
-                module_nodes_set.add(node)
         
         # Find all connections touching these nodes
-        for connection in self.connections:
-            if connection.orthogonal:
-                # Check if either node of the connection is in the module
-                if connection.node1 in module_nodes_set or connection.node2 in module_nodes_set:
-                    if len(connection.waypoints) > 0:
-                        # Store a copy of the waypoint list
-                        self.module_drag_start_waypoints[connection] = [QPoint(wp) for wp in connection.waypoints]
-
+        for connection in self._connections_of(module_nodes):
+            if connection.orthogonal and len(connection.waypoints) > 0:
+                # Store a copy of the waypoint list
+                self.module_drag_start_waypoints[connection] = [QPoint(wp) for wp in connection.waypoints]
 
     def mousePressEvent(self, event):
         """Handle mouse press events"""
@@ -219,13 +431,18 @@ class DiagramCanvas(QWidget):
             self.setCursor(Qt.CursorShape.ClosedHandCursor)
             return
 
+        # Everything below works in canvas coordinates
+        adjusted_pos = self.screen_to_canvas(pos)
+
         # Handle right mouse button for context menu
         if event.button() == Qt.MouseButton.RightButton:
-            adjusted_pos = self.screen_to_canvas(pos)
+            # Ignore stray right-clicks while a drag or pan is in progress
+            if self.dragging_node or self.dragging_image or self.resizing_image or self.panning:
+                return
             clicked_node = self.get_node_at(adjusted_pos)
             if clicked_node:
                 # Check if this node is part of a module
-                if getattr(clicked_node, 'locked', False) and hasattr(clicked_node, 'module_id') and clicked_node.module_id:
+                if clicked_node.locked and clicked_node.module_id:
                     self.show_module_context_menu(clicked_node.module_id, event.globalPos())
                     return
                 self.show_node_context_menu(clicked_node, event.globalPos())
@@ -240,24 +457,21 @@ class DiagramCanvas(QWidget):
             clicked_image = self.get_image_at(adjusted_pos)
             if clicked_image:
                 # Check if this image is part of a module
-                if hasattr(clicked_image, 'module_instance_id') and clicked_image.module_instance_id:
+                if clicked_image.module_instance_id:
                     self.show_module_context_menu(clicked_image.module_instance_id, event.globalPos())
                     return
 
         if self.mode == "add_node":
-            # Adjust position for pan offset and zoom
-            adjusted_pos = self.screen_to_canvas(pos)
             self.add_node(adjusted_pos)
 
         elif self.mode == "add_connection":
-            # Adjust position for pan offset and zoom
-            adjusted_pos = self.screen_to_canvas(pos)
             clicked_node = self.get_node_at(adjusted_pos)
             if clicked_node:
                 if self.selected_node is None:
                     self.selected_node = clicked_node
                     clicked_node.set_highlighted(True)
-                elif clicked_node != self.selected_node:
+                    self.update()
+                elif clicked_node is not self.selected_node:
                     self.add_connection(self.selected_node, clicked_node)
                     self.selected_node.set_highlighted(False)
                     self.selected_node = None
@@ -265,7 +479,6 @@ class DiagramCanvas(QWidget):
 
         elif self.mode == "add_image":
             # Add image at clicked position
-            adjusted_pos = self.screen_to_canvas(pos)
             self.add_image(self.image_placement_file, adjusted_pos, self.image_placement_width, self.image_placement_height)
             # Reset to normal mode after placing image
             self.set_mode(None)
@@ -273,7 +486,6 @@ class DiagramCanvas(QWidget):
 
         else:
             # Check if a node is clicked
-            adjusted_pos = self.screen_to_canvas(pos)
             clicked_node = self.get_node_at(adjusted_pos)
             
             if clicked_node:
@@ -282,14 +494,12 @@ class DiagramCanvas(QWidget):
                 shift_pressed = event.modifiers() & Qt.KeyboardModifier.ShiftModifier
                 
                 # If node is part of a module (locked), behavior depends on edit mode
-                if getattr(clicked_node, 'locked', False) and hasattr(clicked_node, 'module_id') and clicked_node.module_id and not self.module_edit_mode:
+                if clicked_node.locked and clicked_node.module_id and not self.module_edit_mode:
                     # Not in edit mode - select the entire module
                     self.clear_selection()
                     module_id = clicked_node.module_id
                     self.selected_module_id = module_id
-                    for node in self.nodes:
-                        if hasattr(node, 'module_id') and node.module_id == module_id:
-                            self.select_node(node, multi=True)
+                    self.select_nodes(self.get_module_members(module_id)[0])
                 elif self.module_edit_mode and ctrl_pressed:
                     # In edit mode with Ctrl - toggle individual node selection
                     if clicked_node in self.selected_nodes:
@@ -300,15 +510,13 @@ class DiagramCanvas(QWidget):
                     # In edit mode without Ctrl - select single node
                     self.clear_selection()
                     self.select_node(clicked_node)
-                elif shift_pressed and hasattr(clicked_node, 'module_id'):
+                elif shift_pressed and clicked_node.module_id:
                     # Shift+click selects all nodes in the module
 
                     self.clear_selection()
                     module_id = clicked_node.module_id
                     self.selected_module_id = module_id
-                    for node in self.nodes:
-                        if hasattr(node, 'module_id') and node.module_id == module_id:
-                            self.select_node(node, multi=True)
+                    self.select_nodes(self.get_module_members(module_id)[0])
                 elif ctrl_pressed:
                     if clicked_node in self.selected_nodes:
                         self.deselect_node(clicked_node)
@@ -323,14 +531,16 @@ class DiagramCanvas(QWidget):
                 self.drag_offset = adjusted_pos - clicked_node.pos
                 
                 # If dragging a module node, track all module positions for undo/redo
-                if getattr(clicked_node, 'locked', False) and hasattr(clicked_node, 'module_id') and clicked_node.module_id:
+                if clicked_node.locked and clicked_node.module_id:
                     module_id = clicked_node.module_id
-                    self._setup_module_drag(module_id, adjusted_pos - clicked_node.pos)
+                    self._setup_module_drag(module_id, adjusted_pos - clicked_node.pos, pos)
             else:
                 # Check for waypoints on orthogonal connections FIRST (highest priority)
                 waypoint_connection = None
                 waypoint_idx = -1
-                for connection in self.connections:
+                # A connection's bounds include its waypoint handles
+                area = QRectF(adjusted_pos.x(), adjusted_pos.y(), 1, 1)
+                for connection in self.get_connections_in_rect(area):
                     if connection.orthogonal:
                         idx = connection.get_waypoint_at(adjusted_pos)
                         if idx >= 0:
@@ -363,22 +573,21 @@ class DiagramCanvas(QWidget):
                     clicked_image = self.get_image_at(adjusted_pos)
                     if clicked_image:
                         # Check if image is part of a module - if so, select/drag the entire module
-                        if hasattr(clicked_image, 'module_instance_id') and clicked_image.module_instance_id:
+                        if clicked_image.module_instance_id:
                             # Find and select all nodes in this module instance
                             module_id = clicked_image.module_instance_id
-                            module_nodes = [n for n in self.nodes if hasattr(n, 'module_id') and n.module_id == module_id]
+                            module_nodes = list(self.get_module_members(module_id)[0])
                             
                             if module_nodes:
                                 # Clear and select all module nodes
                                 self.clear_selection()
                                 self.selected_module_id = module_id
-                                for node in module_nodes:
-                                    self.select_node(node, multi=True)
+                                self.select_nodes(module_nodes)
                                 # Start dragging from the first node
                                 self.dragging_node = module_nodes[0]
                                 self.drag_offset = adjusted_pos - self.dragging_node.pos
                                 # Setup module drag tracking (waypoints, positions, etc)
-                                self._setup_module_drag(module_id, self.drag_offset)
+                                self._setup_module_drag(module_id, self.drag_offset, pos)
                         else:
                             # Regular image not part of a module - can be dragged independently
                             # Check if clicking on resize handle
@@ -391,13 +600,13 @@ class DiagramCanvas(QWidget):
                                 self.resize_start_pos = adjusted_pos
                                 self.resize_start_dims = (clicked_image.width, clicked_image.height)
                                 self.image_resize_start_dims = (clicked_image.width, clicked_image.height)
-                                self.selection_changed.emit()
+                                self.notify_selection_changed()
                                 self.update()
                             else:
                                 # Regular click on image - select and prepare to drag
                                 ctrl_pressed = event.modifiers() & Qt.KeyboardModifier.ControlModifier
                                 if ctrl_pressed:
-                                    if clicked_image in [img for img in self.images if img.selected]:
+                                    if clicked_image.selected:
                                         clicked_image.set_selected(False)
                                     else:
                                         clicked_image.set_selected(True)
@@ -407,35 +616,59 @@ class DiagramCanvas(QWidget):
                                 self.dragging_image = clicked_image
                                 self.image_drag_start_pos = clicked_image.pos
                                 self.drag_offset = adjusted_pos - clicked_image.pos
-                                self.selection_changed.emit()
+                                self.notify_selection_changed()
                                 self.update()
                     else:
                         # Clear selection if clicking on empty space
                         self.clear_selection() 
 
     def mouseMoveEvent(self, event):
-        """Handle mouse move events"""
+        """Handle mouse move events, coalescing bursts into one update per frame"""
+        # Nothing follows the cursor unless a pan or drag is in progress
+        if not (self.panning or self.dragging_connection or self.resizing_image
+                or self.dragging_image or self.dragging_node):
+            return
+        self._pending_move_pos = event.pos()
+        if not self._move_timer.isActive():
+            self._move_timer.start()
+
+    def _flush_move(self):
+        """Apply the most recent pending mouse move, if any"""
+        pos = self._pending_move_pos
+        if pos is None:
+            return
+        self._pending_move_pos = None
+        self._move_timer.stop()
+        self.handle_mouse_move(pos)
+
+    def handle_mouse_move(self, pos):
+        """Handle a mouse move to the given widget position"""
         if self.panning:
             # Calculate the pan offset
-            delta = event.pos() - self.pan_start
-            self.pan_offset += delta
-            self.pan_start = event.pos()
-            self.update()
+            delta = pos - self.pan_start
+            self.set_pan_offset(self.pan_offset + delta)
+            self.pan_start = pos
         elif self.dragging_connection and self.dragging_waypoint_index >= 0:
             # Handle waypoint dragging for orthogonal connections
-            adjusted_pos = self.screen_to_canvas(event.pos())
+            adjusted_pos = self.screen_to_canvas(pos)
             # Snap to grid if enabled
             adjusted_pos = self.snap_to_grid_point(adjusted_pos)
             
+            if self.dragging_connection.waypoints[self.dragging_waypoint_index] == adjusted_pos:
+                return
+            
             # Update waypoint position
+            moved = (self.dragging_connection,)
+            old_bounds = self._element_bounds(connections=moved)
             self.dragging_connection.waypoints[self.dragging_waypoint_index] = adjusted_pos
-            self.update()
+            self._reindex_moved(connections=moved)
+            self.update_moved(old_bounds, connections=moved)
         elif self.resizing_image:
             # Handle image resizing - only for images NOT part of a module
-            if not (hasattr(self.resizing_image, 'module_instance_id') and self.resizing_image.module_instance_id):
+            if not self.resizing_image.module_instance_id:
                 import math
                 
-                adjusted_pos = self.screen_to_canvas(event.pos())
+                adjusted_pos = self.screen_to_canvas(pos)
                 delta_x = adjusted_pos.x() - self.resize_start_pos.x()
                 delta_y = adjusted_pos.y() - self.resize_start_pos.y()
                 
@@ -449,99 +682,120 @@ class DiagramCanvas(QWidget):
                     new_width = max(20, self.resize_start_dims[0] + delta_x)
                     new_height = max(20, self.resize_start_dims[1] + delta_y)
                 
+                if (new_width, new_height) == (self.resizing_image.width, self.resizing_image.height):
+                    return
+                self._drag_moved = True
+                moved = (self.resizing_image,)
+                old_bounds = self._element_bounds(images=moved)
                 self.resizing_image.width = new_width
                 self.resizing_image.height = new_height
-                self.update()
+                self._reindex_moved(images=moved)
+                self.update_moved(old_bounds, images=moved)
 
         elif self.dragging_image:
             # Handle image dragging - only for images NOT part of a module
-            if not (hasattr(self.dragging_image, 'module_instance_id') and self.dragging_image.module_instance_id):
-                adjusted_pos = self.screen_to_canvas(event.pos())
+            if not self.dragging_image.module_instance_id:
+                adjusted_pos = self.screen_to_canvas(pos)
                 new_pos = adjusted_pos - self.drag_offset
+                if new_pos == self.dragging_image.pos:
+                    return
+                self._drag_moved = True
+                moved = (self.dragging_image,)
+                old_bounds = self._element_bounds(images=moved)
                 self.dragging_image.pos = new_pos
-                self.update()
+                self._reindex_moved(images=moved)
+                self.update_moved(old_bounds, images=moved)
         elif self.dragging_node:
-            new_pos = self.screen_to_canvas(event.pos()) - self.drag_offset
+            new_pos = self.screen_to_canvas(pos) - self.drag_offset
             # Snap to grid if enabled
             new_pos = self.snap_to_grid_point(new_pos)
             delta = new_pos - self.dragging_node.pos
-            
-            # Determine if movement is horizontal or vertical
-            is_horizontal_move = delta.y() == 0 and delta.x() != 0
-            is_vertical_move = delta.x() == 0 and delta.y() != 0
+            if delta.isNull():
+                # Snapped to the same grid point: nothing to move or repaint
+                return
+            if self.dragging_module and not self.module_drag_start_positions and \
+               (pos - self.module_drag_press_pos).manhattanLength() < QApplication.startDragDistance():
+                # A click with a little jitter selects the module without moving it
+                return
+            if self.dragging_module and not self.module_drag_start_positions:
+                # First real movement of this drag: snapshot before anything moves
+                self._snapshot_module_drag(*self.get_module_members(self.dragging_module))
+            self._drag_moved = True
             
             # Check if dragging a module node - if so, move entire module
-            if getattr(self.dragging_node, 'locked', False) and hasattr(self.dragging_node, 'module_id') and self.dragging_node.module_id:
+            if self.dragging_node.locked and self.dragging_node.module_id:
                 # Move all nodes in the same module
                 module_id = self.dragging_node.module_id
-                for node in self.nodes:
-                    if hasattr(node, 'module_id') and node.module_id == module_id:
-                        node.pos = node.pos + delta
-                        # Move waypoints for orthogonal connections attached to this node
-                        for connection in self.connections:
-                            if connection.orthogonal and len(connection.waypoints) > 0:
-                                if connection.node1 == node:
-                                    # Check if first waypoint is horizontal or vertical from node
-                                    if len(connection.waypoints) > 1:
-                                        first_segment_is_horizontal = connection.waypoints[0].y() == connection.waypoints[1].y()
-                                    else:
-                                        first_segment_is_horizontal = connection.waypoints[0].y() == connection.node2.pos.y()
-                                    
-                                    # Only move first waypoint if movement is perpendicular to segment
-                                    if (is_horizontal_move and first_segment_is_horizontal) or \
-                                       (is_vertical_move and not first_segment_is_horizontal):
-                                        connection.waypoints[0] = connection.waypoints[0] + delta
-                                
-                                if connection.node2 == node and len(connection.waypoints) > 1:
-                                    # Check if last waypoint is horizontal or vertical to node
-                                    if len(connection.waypoints) > 1:
-                                        last_segment_is_horizontal = connection.waypoints[-1].y() == connection.waypoints[-2].y()
-                                    else:
-                                        last_segment_is_horizontal = connection.waypoints[-1].y() == connection.node1.pos.y()
-                                    
-                                    # Only move last waypoint if movement is perpendicular to segment
-                                    if (is_horizontal_move and last_segment_is_horizontal) or \
-                                       (is_vertical_move and not last_segment_is_horizontal):
-                                        connection.waypoints[-1] = connection.waypoints[-1] + delta
-                
+                module_nodes, module_images = self.get_module_members(module_id)
+                old_bounds = self._element_bounds(module_nodes, module_images)
+                # Move waypoints for orthogonal connections attached to the module, once per connection
+                for connection in self._connections_of(module_nodes):
+                    if connection.orthogonal and connection.waypoints:
+                        self._shift_end_waypoints(
+                            connection, delta,
+                            connection.node1.module_id == module_id,
+                            connection.node2.module_id == module_id
+                        )
+                # Translate in place; module members own their position objects
+                for node in module_nodes:
+                    node.pos += delta
                 # Also move all images in the same module instance
-                for image in self.images:
-                    if hasattr(image, 'module_instance_id') and image.module_instance_id == module_id:
-                        image.pos = image.pos + delta
+                for image in module_images:
+                    image.pos += delta
+                self._reindex_moved(nodes=module_nodes, images=module_images)
+                self.update_moved(old_bounds, nodes=module_nodes, images=module_images)
             else:
                 # Move only this node
-                self.dragging_node.pos = new_pos
+                node = self.dragging_node
+                old_bounds = self._element_bounds(nodes=(node,))
                 # Move waypoints for orthogonal connections attached to this node
-                for connection in self.connections:
-                    if connection.orthogonal and len(connection.waypoints) > 0:
-                        if connection.node1 == self.dragging_node:
-                            # Check if first waypoint is horizontal or vertical from node
-                            if len(connection.waypoints) > 1:
-                                first_segment_is_horizontal = connection.waypoints[0].y() == connection.waypoints[1].y()
-                            else:
-                                first_segment_is_horizontal = connection.waypoints[0].y() == connection.node2.pos.y()
-                            
-                            # Only move first waypoint if movement is perpendicular to segment
-                            if (is_horizontal_move and first_segment_is_horizontal) or \
-                               (is_vertical_move and not first_segment_is_horizontal):
-                                connection.waypoints[0] = connection.waypoints[0] + delta
-                        
-                        if connection.node2 == self.dragging_node and len(connection.waypoints) > 1:
-                            # Check if last waypoint is horizontal or vertical to node
-                            if len(connection.waypoints) > 1:
-                                last_segment_is_horizontal = connection.waypoints[-1].y() == connection.waypoints[-2].y()
-                            else:
-                                last_segment_is_horizontal = connection.waypoints[-1].y() == connection.node1.pos.y()
-                            
-                            # Only move last waypoint if movement is perpendicular to segment
-                            if (is_horizontal_move and last_segment_is_horizontal) or \
-                               (is_vertical_move and not last_segment_is_horizontal):
-                                connection.waypoints[-1] = connection.waypoints[-1] + delta
-            
-            self.update()
+                for connection in self.get_node_connections(node):
+                    if connection.orthogonal and connection.waypoints:
+                        self._shift_end_waypoints(
+                            connection, delta, connection.node1 is node, connection.node2 is node
+                        )
+                node.pos = new_pos
+                
+                self._reindex_moved(nodes=(node,))
+                if self.selected_module_id:
+                    # A node moving inside a selected module can reshape its whole box
+                    self.update()
+                else:
+                    self.update_moved(old_bounds, nodes=(node,))
+
+    @staticmethod
+    def _shift_end_waypoints(connection, delta, start_moved, end_moved):
+        """Move the waypoints next to moved end nodes when the move is perpendicular to their segment"""
+        is_horizontal_move = delta.y() == 0 and delta.x() != 0
+        is_vertical_move = delta.x() == 0 and delta.y() != 0
+        if not (is_horizontal_move or is_vertical_move):
+            return
+        
+        # Read both segment directions before either waypoint moves
+        waypoints = connection.waypoints
+        shift_first = shift_last = False
+        if start_moved:
+            # Check if first waypoint is horizontal or vertical from node
+            if len(waypoints) > 1:
+                first_segment_is_horizontal = waypoints[0].y() == waypoints[1].y()
+            else:
+                first_segment_is_horizontal = waypoints[0].y() == connection.node2.pos.y()
+            shift_first = first_segment_is_horizontal == is_horizontal_move
+        if end_moved and len(waypoints) > 1:
+            # Check if last waypoint is horizontal or vertical to node
+            last_segment_is_horizontal = waypoints[-1].y() == waypoints[-2].y()
+            shift_last = last_segment_is_horizontal == is_horizontal_move
+        
+        if shift_first:
+            waypoints[0] = waypoints[0] + delta
+        if shift_last:
+            waypoints[-1] = waypoints[-1] + delta
 
     def mouseReleaseEvent(self, event):
         """Handle mouse release events"""
+        # Apply the final drag position before ending the drag
+        self._flush_move()
+        
         if self.panning:
             self.panning = False
             self.setCursor(Qt.CursorShape.ArrowCursor)
@@ -570,22 +824,14 @@ class DiagramCanvas(QWidget):
         
         # Create action for module move if it changed
         if self.dragging_module and self.module_drag_start_positions:
-            # Check if any node or image in the module moved
-            moved = False
-            for node, start_pos in self.module_drag_start_positions.items():
-                if node.pos != start_pos:
-                    moved = True
-                    break
-            if not moved:
-                for image, start_pos in self.module_drag_start_image_positions.items():
-                    if image.pos != start_pos:
-                        moved = True
-                        break
+            # Measure the offset on the dragged node; locked members all move with it
+            anchor = self.dragging_node
+            start_pos = self.module_drag_start_positions.get(anchor)
+            if start_pos is None:
+                anchor, start_pos = next(iter(self.module_drag_start_positions.items()))
+            delta = anchor.pos - start_pos
             
-            if moved:
-                # Get current positions
-                new_node_positions = {node: QPoint(node.pos) for node in self.module_drag_start_positions.keys()}
-                new_image_positions = {image: QPoint(image.pos) for image in self.module_drag_start_image_positions.keys()}
+            if not delta.isNull():
                 # Get current waypoint positions
                 new_waypoint_positions = {}
                 for conn in self.module_drag_start_waypoints.keys():
@@ -599,14 +845,17 @@ class DiagramCanvas(QWidget):
                     self.dragging_module,
                     list(self.module_drag_start_positions.keys()),
                     list(self.module_drag_start_image_positions.keys()),
-                    {"nodes": self.module_drag_start_positions, "images": self.module_drag_start_image_positions, "waypoints": self.module_drag_start_waypoints},
-                    {"nodes": new_node_positions, "images": new_image_positions, "waypoints": new_waypoint_positions}
+                    delta,
+                    self.module_drag_start_waypoints,
+                    new_waypoint_positions
                 )
                 self.execute_action(action)
         
-        if self.dragging_node or self.dragging_image or self.resizing_image:
-            self.diagram_modified.emit()
+        # A click without movement leaves the diagram unmodified
+        if self._drag_moved and (self.dragging_node or self.dragging_image or self.resizing_image):
+            self.notify_modified()
         
+        self._drag_moved = False
         self.dragging_node = None
         self.dragging_image = None
         self.resizing_image = None
@@ -622,9 +871,7 @@ class DiagramCanvas(QWidget):
         node = Node(f"Node{self.node_counter}", snapped_pos)
         node.node_class = self.default_node_class
         # Get the color for this class
-        config = get_config()
-        color_tuple = config.get_node_class_color(self.default_node_class)
-        node.color = QColor(*color_tuple)
+        node.color = get_color(self.get_class_color(self.default_node_class))
         
         # If we're in module edit mode, assign the node to the module being edited
         if self.module_edit_mode and self.module_being_edited:
@@ -645,10 +892,10 @@ class DiagramCanvas(QWidget):
                                 f"Nodes must have the same class to be connected.")
             return
 
-        # Avoid duplicate connections
-        for conn in self.connections:
-            if (conn.node1 == node1 and conn.node2 == node2) or \
-               (conn.node1 == node2 and conn.node2 == node1):
+        # Avoid duplicate connections; any duplicate is attached to node1
+        for conn in self.get_node_connections(node1):
+            if (conn.node1 is node1 and conn.node2 is node2) or \
+               (conn.node1 is node2 and conn.node2 is node1):
                 return
 
         connection = Connection(node1, node2, orthogonal=self.orthogonal_routing)
@@ -660,36 +907,48 @@ class DiagramCanvas(QWidget):
         """Add an image to the canvas (not undoable)"""
         image = Image(image_path, pos, width, height)
         self.images.append(image)
-        self.diagram_modified.emit()
+        self.invalidate_indexes()
+        self.notify_modified()
 
     def get_node_at(self, pos):
         """Get the node at the given position, if any"""
-        for node in self.nodes:
-            if node.rect.contains(pos):
-                return node
-        return None
+        if self._node_grid is None:
+            self._build_spatial_indexes()
+        # Test all candidates, then order only the hits (usually none or one) instead of sorting every candidate
+        hits = [node for node in self._node_grid.intersecting(QRectF(pos.x(), pos.y(), 1, 1))
+                if node.contains_point(pos)]
+        return min(hits, key=self._node_order.__getitem__) if hits else None
 
     def get_connection_at(self, pos):
         """Get the connection at the given position, if any"""
-        for connection in self.connections:
-            if connection.is_point_on_line(pos):
-                return connection
-        return None
+        # Only connections whose bounds come within the hitbox distance can match
+        hitbox = self._hitbox_distance
+        area = QRectF(pos.x() - hitbox, pos.y() - hitbox, 2 * hitbox, 2 * hitbox)
+        if self._node_grid is None:
+            self._build_spatial_indexes()
+        hits = [connection for connection in self._connection_grid.intersecting(area)
+                if connection.is_point_on_line(pos)]
+        return min(hits, key=self._connection_order.__getitem__) if hits else None
 
     def get_image_at(self, pos):
         """Get the image at the given position, if any"""
-        # Check images in reverse order (top to bottom)
-        for image in reversed(self.images):
-            # Use the image's point-in-rotated-rect check
-            if image.is_point_inside(pos):
-                return image
-        return None
+        if self._node_grid is None:
+            self._build_spatial_indexes()
+        # Use the image's point-in-rotated-rect check; the topmost (last drawn) hit wins
+        hits = [image for image in self._image_grid.intersecting(QRectF(pos.x(), pos.y(), 1, 1))
+                if image.is_point_inside(pos)]
+        return max(hits, key=self._image_order.__getitem__) if hits else None
 
     def clear(self):
         """Clear all diagram elements"""
         self.nodes.clear()
         self.connections.clear()
         self.images.clear()
+        self.invalidate_indexes()
+        # Old actions refer to elements that no longer exist; drop them so they can be freed
+        self.undo_stack.clear()
+        self.redo_stack.clear()
+        self.module_edit_original_positions = {}
         self.node_counter = 0
         self.selected_node = None
         self.dragging_node = None
@@ -701,17 +960,23 @@ class DiagramCanvas(QWidget):
         if not multi:
             self.clear_selection()
         if node not in self.selected_nodes:
-            self.selected_nodes.append(node)
+            self.selected_nodes[node] = None
             node.set_selected(True)
-        self.selection_changed.emit()
+        self.notify_selection_changed()
         self.update()
 
+    def select_nodes(self, nodes):
+        """Add several nodes to the selection with one repaint and selection_changed signal"""
+        with self.batch_updates():
+            for node in nodes:
+                self.select_node(node, multi=True)
+
     def deselect_node(self, node):
         """Deselect a node"""
         if node in self.selected_nodes:
-            self.selected_nodes.remove(node)
+            del self.selected_nodes[node]
             node.set_selected(False)
-        self.selection_changed.emit()
+        self.notify_selection_changed()
         self.update()
 
     def select_connection(self, connection, multi=False):
@@ -719,17 +984,17 @@ class DiagramCanvas(QWidget):
         if not multi:
             self.clear_selection()
         if connection not in self.selected_connections:
-            self.selected_connections.append(connection)
+            self.selected_connections[connection] = None
             connection.set_selected(True)
-        self.selection_changed.emit()
+        self.notify_selection_changed()
         self.update()
 
     def deselect_connection(self, connection):
         """Deselect a connection"""
         if connection in self.selected_connections:
-            self.selected_connections.remove(connection)
+            del self.selected_connections[connection]
             connection.set_selected(False)
-        self.selection_changed.emit()
+        self.notify_selection_changed()
         self.update()
 
     def clear_selection(self):
@@ -743,128 +1008,173 @@ class DiagramCanvas(QWidget):
         self.selected_nodes.clear()
         self.selected_connections.clear()
         self.selected_module_id = None
-        self.selection_changed.emit()
+        self.notify_selection_changed()
         self.update()
 
+    def get_selected_nodes(self):
+        """Get list of selected nodes, in selection order"""
+        return list(self.selected_nodes)
+
+    def get_selected_connections(self):
+        """Get list of selected connections, in selection order"""
+        return list(self.selected_connections)
+
     def get_selected_images(self):
         """Get list of selected images"""
         return [img for img in self.images if img.selected]
         self.selected_connections.clear()
-        self.selection_changed.emit()
+        self.notify_selection_changed()
         self.update()
 
     def delete_selected(self):
         """Delete all selected nodes and their connections"""
-        # Track if there are any selected images
-        selected_images = [img for img in self.images if img.selected]
-        
-        if not self.selected_nodes and not self.selected_connections and not selected_images:
-            return
-        
-        # Check if any selected node is part of a module
-        module_ids_to_delete = set()
-        non_module_nodes = []
-        
-        for node in self.selected_nodes:
-            if getattr(node, 'locked', False) and hasattr(node, 'module_id') and node.module_id:
-                module_ids_to_delete.add(node.module_id)
-            else:
-                non_module_nodes.append(node)
-        
-        # Delete modules using the proper action system
-        for module_id in module_ids_to_delete:
-            print(f"[DEBUG keyPressEvent] Deleting module '{module_id}' from Delete key")
-            self.delete_module(module_id)
-        
-        # Collect non-module nodes to delete
-        nodes_to_delete = list(non_module_nodes)
-        
-        # Create delete actions for non-module nodes
-        for node in nodes_to_delete:
-            if node in self.nodes:
-                action = DeleteNodeAction(self, node)
-                self.execute_action(action)
-        
-        # Delete selected connections (that aren't part of a deleted module)
-        for conn in self.selected_connections:
-            if conn in self.connections:
-                action = DeleteConnectionAction(self, conn)
-                self.execute_action(action)
-        
-        # Delete selected images that are NOT part of a module
-        for image in selected_images:
-            if image in self.images and not (hasattr(image, 'module_instance_id') and image.module_instance_id):
+        # Each delete is its own undoable action; repaint and notify once at the end
+        with self.batch_updates():
+            # One pass over the images: note any selection, and collect the selected
+            # images that are NOT part of a module (module images go with their module)
+            any_image_selected = False
+            plain_images = []
+            for image in self.images:
+                if image.selected:
+                    any_image_selected = True
+                    if not image.module_instance_id:
+                        plain_images.append(image)
+            
+            if not self.selected_nodes and not self.selected_connections and not any_image_selected:
+                return
+            
+            # Check if any selected node is part of a module
+            module_ids_to_delete = set()
+            non_module_nodes = []
+            
+            for node in self.selected_nodes:
+                if node.locked and node.module_id:
+                    module_ids_to_delete.add(node.module_id)
+                else:
+                    non_module_nodes.append(node)
+            
+            # Delete modules using the proper action system
+            for module_id in module_ids_to_delete:
+                print(f"[DEBUG keyPressEvent] Deleting module '{module_id}' from Delete key")
+                self.delete_module(module_id)
+            
+            # Create delete actions for non-module nodes; each node is deleted
+            # at most once, so the remaining nodes can be snapshotted up front
+            remaining_nodes = set(self.nodes)
+            for node in non_module_nodes:
+                if node in remaining_nodes:
+                    action = DeleteNodeAction(self, node)
+                    self.execute_action(action)
+            
+            # Delete selected connections (that aren't part of a deleted module or node)
+            remaining_connections = set(self.connections)
+            for conn in list(self.selected_connections):
+                if conn in remaining_connections:
+                    action = DeleteConnectionAction(self, conn)
+                    self.execute_action(action)
+            
+            # Delete selected images that are NOT part of a module; deleting
+            # modules and nodes never removes these, so they are all still present
+            for image in plain_images:
                 action = DeleteImageAction(self, image)
                 self.execute_action(action)
-        
-        self.clear_selection()
+            
+            self.clear_selection()
 
     def show_context_menu(self, node, global_pos):
         """Show a context menu for a node"""
-        menu = QMenu(self)
-        
-        edit_action = menu.addAction("Edit Properties")
-        edit_action.triggered.connect(lambda: self.edit_node(node))
-        
-        menu.addSeparator()
-        
-        delete_action = menu.addAction("Delete")
-        delete_action.triggered.connect(lambda: self.delete_node(node))
-        
-        menu.exec_(global_pos)
+        self.show_node_context_menu(node, global_pos)
 
     def show_node_context_menu(self, node, global_pos):
         """Show a context menu for a node"""
-        menu = QMenu(self)
-        
-        edit_action = menu.addAction("Edit Properties")
-        edit_action.triggered.connect(lambda: self.edit_node(node))
-        
-        menu.addSeparator()
-        
-        delete_action = menu.addAction("Delete")
-        delete_action.triggered.connect(lambda: self.delete_node(node))
+        if self._node_menu is None:
+            menu = QMenu(self)
+            menu.addAction("Edit Properties").triggered.connect(self._on_node_menu_edit)
+            menu.addSeparator()
+            menu.addAction("Delete").triggered.connect(self._on_node_menu_delete)
+            self._node_menu = menu
         
-        menu.exec_(global_pos)
+        self._context_node = node
+        self._node_menu.exec_(global_pos)
+        self._context_node = None
 
     def show_connection_context_menu(self, connection, global_pos):
         """Show a context menu for a connection"""
-        menu = QMenu(self)
-        
-        # Add waypoint options for orthogonal connections
-        if connection.orthogonal:
-            add_point_action = menu.addAction("Add Point")
-            # Store the global position for use in the handler
-            add_point_action.triggered.connect(lambda: self.add_connection_waypoint(connection, global_pos))
-            
-            # Check if there are waypoints to remove
-            if len(connection.waypoints) > 2:
-                remove_point_action = menu.addAction("Remove Closest Point")
-                remove_point_action.triggered.connect(lambda: self.remove_connection_waypoint(connection, global_pos))
-            
-            menu.addSeparator()
-        
-        delete_action = menu.addAction("Delete Connection")
-        delete_action.triggered.connect(lambda: self.delete_connection(connection))
-        
-        menu.exec_(global_pos)
+        if self._connection_menu is None:
+            menu = QMenu(self)
+            self._connection_menu_add_point = menu.addAction("Add Point")
+            self._connection_menu_add_point.triggered.connect(self._on_connection_menu_add_point)
+            self._connection_menu_remove_point = menu.addAction("Remove Closest Point")
+            self._connection_menu_remove_point.triggered.connect(self._on_connection_menu_remove_point)
+            self._connection_menu_separator = menu.addSeparator()
+            menu.addAction("Delete Connection").triggered.connect(self._on_connection_menu_delete)
+            self._connection_menu = menu
+        
+        # Waypoint options only apply to orthogonal connections
+        self._connection_menu_add_point.setVisible(connection.orthogonal)
+        self._connection_menu_remove_point.setVisible(connection.orthogonal and len(connection.waypoints) > 2)
+        self._connection_menu_separator.setVisible(connection.orthogonal)
+        
+        # Store the global position for use in the waypoint handlers
+        self._context_connection = connection
+        self._context_pos = global_pos
+        self._connection_menu.exec_(global_pos)
+        self._context_connection = None
+        self._context_pos = None
 
     def show_module_context_menu(self, module_id, global_pos):
         """Show a context menu for a module"""
-        menu = QMenu(self)
-        
-        edit_action = menu.addAction("Edit Module")
-        edit_action.triggered.connect(lambda: self.edit_module(module_id))
-        
-        duplicate_action = menu.addAction("Duplicate Module")
-        duplicate_action.triggered.connect(lambda: self.duplicate_module(module_id))
-        
-        menu.addSeparator()
-        
-        delete_action = menu.addAction("Delete Module")
-        delete_action.triggered.connect(lambda: self.delete_module(module_id))
-        
-        menu.exec_(global_pos)
+        if self._module_menu is None:
+            menu = QMenu(self)
+            menu.addAction("Edit Module").triggered.connect(self._on_module_menu_edit)
+            menu.addAction("Duplicate Module").triggered.connect(self._on_module_menu_duplicate)
+            menu.addSeparator()
+            menu.addAction("Delete Module").triggered.connect(self._on_module_menu_delete)
+            self._module_menu = menu
+        
+        self._context_module_id = module_id
+        self._module_menu.exec_(global_pos)
+        self._context_module_id = None
+
+    def _on_node_menu_edit(self):
+        """Edit the node the context menu was opened on"""
+        if self._context_node is not None:
+            self.edit_node(self._context_node)
+
+    def _on_node_menu_delete(self):
+        """Delete the node the context menu was opened on"""
+        if self._context_node is not None:
+            self.delete_node(self._context_node)
+
+    def _on_connection_menu_add_point(self):
+        """Add a waypoint to the connection the context menu was opened on"""
+        if self._context_connection is not None:
+            self.add_connection_waypoint(self._context_connection, self._context_pos)
+
+    def _on_connection_menu_remove_point(self):
+        """Remove a waypoint from the connection the context menu was opened on"""
+        if self._context_connection is not None:
+            self.remove_connection_waypoint(self._context_connection, self._context_pos)
+
+    def _on_connection_menu_delete(self):
+        """Delete the connection the context menu was opened on"""
+        if self._context_connection is not None:
+            self.delete_connection(self._context_connection)
+
+    def _on_module_menu_edit(self):
+        """Edit the module the context menu was opened on"""
+        if self._context_module_id is not None:
+            self.edit_module(self._context_module_id)
+
+    def _on_module_menu_duplicate(self):
+        """Duplicate the module the context menu was opened on"""
+        if self._context_module_id is not None:
+            self.duplicate_module(self._context_module_id)
+
+    def _on_module_menu_delete(self):
+        """Delete the module the context menu was opened on"""
+        if self._context_module_id is not None:
+            self.delete_module(self._context_module_id)
 
     def edit_node(self, node):
         """Edit node properties"""
@@ -877,24 +1187,35 @@ class DiagramCanvas(QWidget):
 
     def delete_node(self, node):
         """Delete a node and its connections"""
+        self.delete_nodes([node])
+
+    def delete_nodes(self, nodes):
+        """Delete several nodes and their connections in a single pass"""
+        nodes = list(nodes)
+        # Compare by identity so the filters stay O(1) per element
+        doomed = set(map(id, nodes))
+
         # Remove connections
         self.connections = [
             conn for conn in self.connections
-            if conn.node1 != node and conn.node2 != node
+            if id(conn.node1) not in doomed and id(conn.node2) not in doomed
         ]
-        
-        # Remove node
-        if node in self.nodes:
-            self.nodes.remove(node)
-        
-        # Remove from selection
-        self.deselect_node(node)
-        self.update()
+
+        # Remove nodes
+        self.nodes = [n for n in self.nodes if id(n) not in doomed]
+        self.invalidate_indexes()
+
+        # Remove from selection with a single selection_changed and repaint
+        with self.batch_updates():
+            for node in nodes:
+                self.deselect_node(node)
+            self.update()
 
     def delete_connection(self, connection):
         """Delete a connection"""
         if connection in self.connections:
             self.connections.remove(connection)
+            self.invalidate_indexes()
         
         # Remove from selection
         self.deselect_connection(connection)
@@ -914,32 +1235,35 @@ class DiagramCanvas(QWidget):
         min_distance = float('inf')
         closest_segment_idx = 0
         closest_point = None
+        x0, y0 = canvas_pos.x(), canvas_pos.y()
         
         for seg_idx, (seg_start, seg_end) in enumerate(segments):
-            # Find closest point on this segment
-            x0, y0 = canvas_pos.x(), canvas_pos.y()
             x1, y1 = seg_start.x(), seg_start.y()
             x2, y2 = seg_end.x(), seg_end.y()
             
+            # Perpendicular distance first; the closest point is only needed for a new best
             if x1 == x2:  # Vertical segment
-                # Clamp y between segment endpoints
-                y = max(min(y1, y2), min(y0, max(y1, y2)))
-                closest = QPoint(x1, y)
-                distance = abs(x0 - x1)
+                distance = x0 - x1 if x0 >= x1 else x1 - x0
             else:  # Horizontal segment
-                # Clamp x between segment endpoints
-                x = max(min(x1, x2), min(x0, max(x1, x2)))
-                closest = QPoint(x, y1)
-                distance = abs(y0 - y1)
+                distance = y0 - y1 if y0 >= y1 else y1 - y0
+            if distance >= min_distance:
+                continue
             
-            if distance < min_distance:
-                min_distance = distance
-                closest_point = closest
-                closest_segment_idx = seg_idx
+            if x1 == x2:
+                # Clamp y between segment endpoints
+                lo, hi = (y1, y2) if y1 <= y2 else (y2, y1)
+                closest = (x1, lo if y0 < lo else hi if y0 > hi else y0)
+            else:
+                # Clamp x between segment endpoints
+                lo, hi = (x1, x2) if x1 <= x2 else (x2, x1)
+                closest = (lo if x0 < lo else hi if x0 > hi else x0, y1)
+            min_distance = distance
+            closest_point = closest
+            closest_segment_idx = seg_idx
         
         # Add waypoint at the closest segment
-        if closest_point:
-            action = AddWaypointAction(self, connection, closest_point, closest_segment_idx)
+        if closest_point is not None:
+            action = AddWaypointAction(self, connection, QPoint(*closest_point), closest_segment_idx)
             self.execute_action(action)
 
     def remove_connection_waypoint(self, connection, global_pos):
@@ -956,9 +1280,13 @@ class DiagramCanvas(QWidget):
         closest_waypoint_idx = -1
         
         # Skip first and last waypoints (they are the nodes themselves)
+        cx, cy = canvas_pos.x(), canvas_pos.y()
         for i in range(1, len(connection.waypoints) - 1):
             wp = connection.waypoints[i]
-            distance = math.sqrt((wp.x() - canvas_pos.x())**2 + (wp.y() - canvas_pos.y())**2)
+            # Squared distance orders waypoints the same as the true distance
+            dx = wp.x() - cx
+            dy = wp.y() - cy
+            distance = dx * dx + dy * dy
             if distance < min_distance:
                 min_distance = distance
                 closest_waypoint_idx = i
@@ -983,25 +1311,25 @@ class DiagramCanvas(QWidget):
         self.selected_module_id = module_id
         
         # Unlock all nodes in the module so they can be edited and store their original positions
-        module_nodes = [node for node in self.nodes if hasattr(node, 'module_id') and node.module_id == module_id]
+        module_nodes, module_images = self.get_module_members(module_id)
         for node in module_nodes:
-            self.module_edit_original_positions[id(node)] = QPoint(node.pos)  # Store original position
+            self.module_edit_original_positions[node] = (node.pos.x(), node.pos.y())  # Store original position
             node.locked = False  # Unlock for editing
-            self.select_node(node, multi=True)
+        self.select_nodes(module_nodes)
         
         # Store original positions of images
-        module_images = [img for img in self.images if hasattr(img, 'module_instance_id') and img.module_instance_id == module_id]
         for image in module_images:
-            self.module_edit_original_positions[id(image)] = QPoint(image.pos)  # Store original position
+            self.module_edit_original_positions[image] = (image.pos.x(), image.pos.y())  # Store original position
         
         # Emit a signal to notify the main window/properties panel that we're in edit mode
-        self.selection_changed.emit()
+        self.notify_selection_changed()
         self.update()
 
     def delete_module(self, module_id):
         """Delete a module and all its elements as a SINGLE undo action"""
-        # Find all nodes in this module
-        nodes_to_delete = [node for node in self.nodes if hasattr(node, 'module_id') and node.module_id == module_id]
+        # Find all nodes and images in this module
+        module_nodes, module_images = self.get_module_members(module_id)
+        nodes_to_delete = list(module_nodes)
         
         if not nodes_to_delete:
             return
@@ -1011,16 +1339,17 @@ class DiagramCanvas(QWidget):
         
         # Find all connections to delete (connections between nodes in this module)
         # and also connections that touch nodes in this module
-        connections_to_delete = []
-        for connection in self.connections:
-            if connection.node1 in nodes_to_delete or connection.node2 in nodes_to_delete:
-                connections_to_delete.append(connection)
-                node1_in = connection.node1 in nodes_to_delete
-                node2_in = connection.node2 in nodes_to_delete
-                print(f"  - Found connection: {connection.node1.name}({node1_in}) -> {connection.node2.name}({node2_in})")
+        nodes_to_delete_set = set(nodes_to_delete)
+        attached = self._connections_of(nodes_to_delete)
+        # Keep canvas order so undo restores the same drawing order
+        connections_to_delete = [connection for connection in self.connections if connection in attached]
+        for connection in connections_to_delete:
+            node1_in = connection.node1 in nodes_to_delete_set
+            node2_in = connection.node2 in nodes_to_delete_set
+            print(f"  - Found connection: {connection.node1.name}({node1_in}) -> {connection.node2.name}({node2_in})")
         
         # Find all images in this module
-        images_to_delete = [img for img in self.images if hasattr(img, 'module_instance_id') and img.module_instance_id == module_id]
+        images_to_delete = list(module_images)
         print(f"  - Found {len(images_to_delete)} images in module")
         print(f"  - Found {len(connections_to_delete)} total connections to delete")
         
@@ -1046,9 +1375,8 @@ class DiagramCanvas(QWidget):
 
     def duplicate_module(self, module_id):
         """Duplicate a module instance with all its nodes, images, and connections"""
-        # Find all nodes in this module
-        nodes_to_duplicate = [node for node in self.nodes if hasattr(node, 'module_id') and node.module_id == module_id]
-        images_to_duplicate = [img for img in self.images if hasattr(img, 'module_instance_id') and img.module_instance_id == module_id]
+        # Find all nodes and images in this module
+        nodes_to_duplicate, images_to_duplicate = self.get_module_members(module_id)
         
         if not nodes_to_duplicate:
             return
@@ -1067,16 +1395,7 @@ class DiagramCanvas(QWidget):
             current_instance = 0
         
         # Find the next available instance number
-        existing_instances = [n for n in self.nodes if hasattr(n, 'module_id') and n.module_id.startswith(f"{base_module_id}_inst_")]
-        max_instance = 0
-        for node in existing_instances:
-            try:
-                inst_num = int(node.module_id.split("_inst_")[1])
-                max_instance = max(max_instance, inst_num)
-            except (ValueError, IndexError):
-                pass
-        
-        new_instance_id = f"{base_module_id}_inst_{max_instance + 1}"
+        new_instance_id = f"{base_module_id}_inst_{self.get_next_instance_number(base_module_id)}"
         
         # Offset for the new module (move it slightly down-right)
         offset = QPoint(50, 50)
@@ -1091,10 +1410,11 @@ class DiagramCanvas(QWidget):
         for node in nodes_to_duplicate:
             new_node = Node(
                 node.name,
-                QPoint(node.pos.x() + offset.x(), node.pos.y() + offset.y())
+                node.pos + offset
             )
             new_node.node_class = node.node_class
-            new_node.color = QColor(node.color.red(), node.color.green(), node.color.blue())
+            # Colors are shared between elements and never changed in place
+            new_node.color = node.color
             new_node.module_id = new_instance_id
             new_node.locked = node.locked
             new_nodes.append(new_node)
@@ -1105,7 +1425,7 @@ class DiagramCanvas(QWidget):
         for image in images_to_duplicate:
             new_image = Image(
                 image.image_path,
-                QPoint(image.pos.x() + offset.x(), image.pos.y() + offset.y()),
+                image.pos + offset,
                 image.width,
                 image.height
             )
@@ -1115,25 +1435,21 @@ class DiagramCanvas(QWidget):
             print(f"[DEBUG duplicate] Created new image with module_instance_id={new_instance_id}")
         
         # Duplicate all connections between nodes in this module
+        # Only the module's own connections need checking, not every connection on the canvas
         connections_to_duplicate = [
-            conn for conn in self.connections 
+            conn for conn in self._connections_of(nodes_to_duplicate)
             if conn.node1 in node_map and conn.node2 in node_map
         ]
         
         for conn in connections_to_duplicate:
+            # Duplicate waypoints if they exist, instead of generating a default route first
             new_connection = Connection(
                 node_map[conn.node1],
                 node_map[conn.node2],
-                orthogonal=conn.orthogonal
+                orthogonal=conn.orthogonal,
+                waypoints=[wp + offset for wp in conn.waypoints] if conn.waypoints else None
             )
-            new_connection.color = QColor(conn.color.red(), conn.color.green(), conn.color.blue())
-            
-            # Duplicate waypoints if they exist
-            if conn.waypoints:
-                new_connection.waypoints = [
-                    QPoint(wp.x() + offset.x(), wp.y() + offset.y()) 
-                    for wp in conn.waypoints
-                ]
+            new_connection.color = conn.color
             
             new_connections.append(new_connection)
         
@@ -1145,8 +1461,7 @@ class DiagramCanvas(QWidget):
         # Select the new module
         self.clear_selection()
         self.selected_module_id = new_instance_id
-        for node in new_nodes:
-            self.select_node(node, multi=True)
+        self.select_nodes(new_nodes)
 
     def save_module_edits(self):
         """Save changes made to a module during edit mode"""
@@ -1157,8 +1472,7 @@ class DiagramCanvas(QWidget):
                 from diagram_elements import Module
                 
                 # Get all nodes and images in the module
-                module_nodes = [node for node in self.nodes if hasattr(node, 'module_id') and node.module_id == self.module_being_edited]
-                module_images = [img for img in self.images if hasattr(img, 'module_instance_id') and img.module_instance_id == self.module_being_edited]
+                module_nodes, module_images = self.get_module_members(self.module_being_edited)
                 
                 # Lock all nodes to re-group the module
                 for node in module_nodes:
@@ -1180,7 +1494,7 @@ class DiagramCanvas(QWidget):
                     # Create a clean node for saving
                     clean_node = Node(node.name, QPoint(node.pos))
                     clean_node.node_class = node.node_class
-                    clean_node.color = QColor(node.color.red(), node.color.green(), node.color.blue())
+                    clean_node.color = get_color((node.color.red(), node.color.green(), node.color.blue()))
                     module.add_node(clean_node)
                 
                 # Add images to module
@@ -1209,24 +1523,24 @@ class DiagramCanvas(QWidget):
         # Restore original positions and lock nodes again
         if self.module_being_edited:
             # Restore node positions
-            module_nodes = [node for node in self.nodes if hasattr(node, 'module_id') and node.module_id == self.module_being_edited]
+            module_nodes, module_images = self.get_module_members(self.module_being_edited)
+            original_positions = self.module_edit_original_positions
             for node in module_nodes:
-                node_id = id(node)
-                if node_id in self.module_edit_original_positions:
-                    node.pos = self.module_edit_original_positions[node_id]
-                    node.update_rect()
+                original = original_positions.get(node)
+                if original is not None:
+                    node.pos = QPoint(*original)
                 node.locked = True  # Lock again
             
             # Restore image positions
-            module_images = [img for img in self.images if hasattr(img, 'module_instance_id') and img.module_instance_id == self.module_being_edited]
             for image in module_images:
-                image_id = id(image)
-                if image_id in self.module_edit_original_positions:
-                    image.pos = self.module_edit_original_positions[image_id]
+                original = original_positions.get(image)
+                if original is not None:
+                    image.pos = QPoint(*original)
                     image.update_rect()
             
             # Clear stored positions
             self.module_edit_original_positions = {}
+            self.invalidate_indexes()
             print(f"Module edit cancelled: {self.module_being_edited}")
 
     def get_viewport_center(self):
@@ -1249,25 +1563,24 @@ class DiagramCanvas(QWidget):
         """Set color for all selected nodes"""
         for node in self.selected_nodes:
             node.color = color
-        self.diagram_modified.emit()
+        self.notify_modified()
         self.update()
 
     def set_selected_nodes_class(self, class_name):
         """Set class for all selected nodes"""
-        config = get_config()
+        # Every node gets the same class color, so look it up once
+        color = get_color(self.get_class_color(class_name))
         for node in self.selected_nodes:
             node.node_class = class_name
-            # Update color based on class
-            color_tuple = config.get_node_class_color(class_name)
-            node.color = QColor(*color_tuple)
-        self.diagram_modified.emit()
+            node.color = color
+        self.notify_modified()
         self.update()
 
     def set_selected_connections_color(self, color):
         """Set color for all selected connections"""
         for connection in self.selected_connections:
             connection.color = color
-        self.diagram_modified.emit()
+        self.notify_modified()
         self.update()
 
     def set_default_node_color(self, color):
@@ -1290,109 +1603,106 @@ class DiagramCanvas(QWidget):
             module_id: The ID of the module to rotate
             direction: 1 for clockwise (+90°), -1 for counter-clockwise (-90°)
         """
-        # Find all nodes belonging to this module
-        module_nodes = [node for node in self.nodes if hasattr(node, 'module_id') and node.module_id == module_id]
-        module_images = [img for img in self.images if hasattr(img, 'module_instance_id') and getattr(img, 'module_instance_id', None) == module_id]
+        # Find all nodes and images belonging to this module
+        module_nodes, module_images = self.get_module_members(module_id)
         
         if not module_nodes:
             return
         
-        # Calculate the centroid of ALL module elements (nodes AND images)
-        all_positions = []
-        
-        # Add node positions
+        # Calculate the centroid of ALL module elements (nodes AND images);
+        # image center is at pos + (width/2, height/2)
+        total_x = total_y = 0
         for node in module_nodes:
-            all_positions.append((node.pos.x(), node.pos.y()))
-        
-        # Add image center positions
+            pos = node.pos
+            total_x += pos.x()
+            total_y += pos.y()
         for image in module_images:
-            # Image center is at pos + (width/2, height/2)
-            image_center_x = image.pos.x() + image.width / 2
-            image_center_y = image.pos.y() + image.height / 2
-            all_positions.append((image_center_x, image_center_y))
-        
-        # Calculate centroid from all positions
-        total_x = sum(x for x, y in all_positions)
-        total_y = sum(y for x, y in all_positions)
-        centroid_x = total_x / len(all_positions)
-        centroid_y = total_y / len(all_positions)
-        
-        # Rotation angle in radians
+            pos = image.pos
+            total_x += pos.x() + image.width / 2
+            total_y += pos.y() + image.height / 2
+        count = len(module_nodes) + len(module_images)
+        centroid_x = total_x / count
+        centroid_y = total_y / count
+        
+        old_state = self._snapshot_rotation(module_nodes, module_images)
+        
+        # A quarter turn maps (dx, dy) to (-dy, dx) clockwise and (dy, -dx) counter-clockwise,
+        # which is exact, unlike cos/sin of 90 degrees
         angle = direction * 90  # degrees
-        angle_rad = math.radians(angle)
-        cos_a = math.cos(angle_rad)
-        sin_a = math.sin(angle_rad)
         
         # Rotate each node around the centroid
         for node in module_nodes:
-            # Translate node relative to centroid
             dx = node.pos.x() - centroid_x
             dy = node.pos.y() - centroid_y
-            
-            # Apply rotation
-            rotated_x = dx * cos_a - dy * sin_a
-            rotated_y = dx * sin_a + dy * cos_a
-            
-            # Translate back
-            new_x = rotated_x + centroid_x
-            new_y = rotated_y + centroid_y
-            
-            # Update node position
-            node.pos = QPoint(int(new_x), int(new_y))
-            node.update_rect()
+            node.pos = QPoint(int(centroid_x - direction * dy), int(centroid_y + direction * dx))
         
         # Rotate each image around the centroid
         for image in module_images:
-            # Get image center
-            image_center_x = image.pos.x() + image.width / 2
-            image_center_y = image.pos.y() + image.height / 2
-            
-            # Translate image center relative to centroid
-            dx = image_center_x - centroid_x
-            dy = image_center_y - centroid_y
-            
-            # Apply rotation
-            rotated_x = dx * cos_a - dy * sin_a
-            rotated_y = dx * sin_a + dy * cos_a
-            
-            # Translate back to centroid
-            new_center_x = rotated_x + centroid_x
-            new_center_y = rotated_y + centroid_y
-            
+            half_width = image.width / 2
+            half_height = image.height / 2
+            dx = image.pos.x() + half_width - centroid_x
+            dy = image.pos.y() + half_height - centroid_y
             # Update image position (top-left corner, not center)
-            image.pos = QPoint(int(new_center_x - image.width / 2), int(new_center_y - image.height / 2))
-            image.update_rect()
+            image.pos = QPoint(
+                int(centroid_x - direction * dy - half_width),
+                int(centroid_y + direction * dx - half_height)
+            )
             
             # Also rotate the image itself
             image.rotation = (image.rotation + angle) % 360
+        
+        # Rects are refreshed once, when the action applies the new state
+        new_state = self._snapshot_rotation(module_nodes, module_images)
+        self.execute_action(RotateModuleAction(self, module_id, old_state, new_state))
+
+    @staticmethod
+    def _snapshot_rotation(nodes, images):
+        """Record the position of module nodes and the position and rotation of its images"""
+        state = {node: (node.pos.x(), node.pos.y(), None) for node in nodes}
+        for image in images:
+            state[image] = (image.pos.x(), image.pos.y(), image.rotation)
+        return state
 
     def execute_action(self, action):
         """Execute an action and add it to the undo stack"""
         action.execute()
-        self.undo_stack.append(action)
+        self.invalidate_indexes()
+        # Quick repeats (such as several rotations in a row) collapse into one undo step
+        if not (self.undo_stack and self.undo_stack[-1].merge(action)):
+            self.undo_stack.append(action)
         self.redo_stack.clear()  # Clear redo stack when a new action is performed
-        self.diagram_modified.emit()
+        self.notify_modified()
         self.update()
 
     def undo(self):
         """Undo the last action"""
         if self.undo_stack:
-            action = self.undo_stack.pop()
-            action.undo()
-            self.redo_stack.append(action)
-            self.diagram_modified.emit()
-            self.clear_selection()
-            self.update()
+            with self.batch_updates():
+                action = self.undo_stack.pop()
+                changed = action.undo()
+                self.invalidate_indexes()
+                self.redo_stack.append(action)
+                # Actions return False when there was nothing to change
+                if changed is not False:
+                    self.notify_modified()
+                self.clear_selection()
 
     def redo(self):
         """Redo the last undone action"""
         if self.redo_stack:
-            action = self.redo_stack.pop()
-            action.execute()
-            self.undo_stack.append(action)
-            self.diagram_modified.emit()
-            self.clear_selection()
-            self.update()
+            with self.batch_updates():
+                action = self.redo_stack.pop()
+                changed = action.execute()
+                self.invalidate_indexes()
+                self.undo_stack.append(action)
+                if changed is not False:
+                    self.notify_modified()
+                self.clear_selection()
+
+    def set_undo_limit(self, limit):
+        """Change how many actions the undo and redo stacks keep, dropping the oldest"""
+        self.undo_stack = deque(self.undo_stack, maxlen=limit)
+        self.redo_stack = deque(self.redo_stack, maxlen=limit)
 
     def can_undo(self):
         """Check if undo is available"""
@@ -1414,79 +1724,294 @@ class DiagramCanvas(QWidget):
             return self.redo_stack[-1].get_description()
         return "Redo"
 
+    def update(self, *args):
+        """Schedule a repaint and mark the cached scene, or the given area of it, as out of date"""
+        if not args:
+            self._scene_dirty = True
+        elif len(args) == 4:
+            self._dirty_region = self._dirty_region.united(QRect(*args))
+        else:
+            self._dirty_region = self._dirty_region.united(args[0])
+        if self._batch_depth:
+            self._pending_update = True
+            return
+        super().update(*args)
+
+    def _element_bounds(self, nodes=(), images=(), connections=()):
+        """Get the canvas-space area covered by elements and the connections attached to the nodes"""
+        bounds = QRectF()
+        for element in (*nodes, *images, *connections):
+            bounds = bounds.united(element.get_bounding_rect())
+        for connection in self._connections_of(nodes):
+            bounds = bounds.united(connection.get_bounding_rect())
+        return bounds
+
+    def _damage_rect(self, old_bounds, new_bounds):
+        """Get the widget-space rectangle to repaint when content moves from old to new bounds"""
+        margin = self.DAMAGE_MARGIN
+        canvas_rect = old_bounds.united(new_bounds).adjusted(-margin, -margin, margin, margin)
+        # Pad by a pixel for antialiased edges that round outward
+        return self.get_view_transform().mapRect(canvas_rect).toAlignedRect().adjusted(-1, -1, 1, 1)
+
+    def update_moved(self, old_bounds, nodes=(), images=(), connections=()):
+        """Repaint only the area elements moved across, given their bounds before the move"""
+        new_bounds = self._element_bounds(nodes, images, connections)
+        self.update(self._damage_rect(old_bounds, new_bounds))
+
+    def notify_modified(self):
+        """Emit diagram_modified, or defer it to the end of the current batch"""
+        if self._batch_depth:
+            self._pending_modified = True
+            return
+        self.diagram_modified.emit()
+
+    def notify_selection_changed(self):
+        """Emit selection_changed, or defer it to the end of the current batch"""
+        if self._batch_depth:
+            self._pending_selection_changed = True
+            return
+        self.selection_changed.emit()
+
+    @contextmanager
+    def batch_updates(self):
+        """Coalesce repaints, diagram_modified and selection_changed signals until the outermost batch ends"""
+        self._batch_depth += 1
+        try:
+            yield
+        finally:
+            self._batch_depth -= 1
+            if self._batch_depth == 0:
+                if self._pending_modified:
+                    self._pending_modified = False
+                    self.diagram_modified.emit()
+                if self._pending_selection_changed:
+                    self._pending_selection_changed = False
+                    self.selection_changed.emit()
+                if self._pending_update:
+                    self._pending_update = False
+                    if self._scene_dirty:
+                        super().update()
+                    else:
+                        super().update(self._dirty_region)
+
     def paintEvent(self, event):
-        """Paint the canvas and all diagram elements"""
-        config = get_config()
-        painter = QPainter(self)
+        """Paint the canvas, re-rendering the scene only if it changed"""
+        # Repaints Qt issues on its own (expose, focus, overlapping windows)
+        # leave the scene untouched, so they just blit the cached rendering
+        dpr = self.devicePixelRatioF()
+        size = self.size() * dpr
+        if self._scene_dirty or self._scene_cache is None or self._scene_cache.size() != size:
+            cache = QPixmap(size)
+            cache.setDevicePixelRatio(dpr)
+            cache.fill(Qt.GlobalColor.transparent)
+            scene_painter = QPainter(cache)
+            self.render_scene(scene_painter, self.rect())
+            scene_painter.end()
+            self._scene_cache = cache
+            self._scene_dirty = False
+        elif not self._dirty_region.isEmpty():
+            # Re-render just the damaged areas on top of the cached scene
+            scene_painter = QPainter(self._scene_cache)
+            for rect in self._dirty_region.rects():
+                scene_painter.save()
+                scene_painter.setCompositionMode(QPainter.CompositionMode.CompositionMode_Source)
+                scene_painter.fillRect(rect, Qt.GlobalColor.transparent)
+                scene_painter.setCompositionMode(QPainter.CompositionMode.CompositionMode_SourceOver)
+                self.render_scene(scene_painter, rect)
+                scene_painter.restore()
+            scene_painter.end()
+        self._dirty_region = QRegion()
         
-        if config.is_antialiasing_enabled():
-            painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+        painter = QPainter(self)
+        painter.drawPixmap(0, 0, self._scene_cache)
+        painter.end()
 
-        # Apply pan transformation
-        painter.translate(self.pan_offset)
+    def render_scene(self, painter, rect):
+        """Paint the diagram elements inside a widget-space rectangle"""
+        # Grid lines and module boxes are axis-aligned, so antialiasing only
+        # costs time there; it is enabled just for images, nodes and connections
+        antialiasing = self._antialiasing
 
-        # Apply zoom transformation
-        painter.scale(self.zoom_level, self.zoom_level)
+        # Apply pan and zoom transformation
+        painter.setWorldTransform(self.get_view_transform())
+
+        # Only paint the requested area; elements outside it are skipped entirely
+        visible = self.screen_to_canvas_rect(rect)
+        painter.setClipRect(visible)
 
         # Draw grid if enabled
         if self.show_grid:
-            self.draw_grid(painter)
+            self.draw_grid(painter, visible)
+
+        painter.setRenderHint(QPainter.RenderHint.Antialiasing, antialiasing)
 
         # Draw images first (as background)
-        for image in self.images:
+        for image in self.get_images_in_rect(visible):
             image.draw(painter)
 
         # Draw module bounding boxes
-        self.draw_module_bounding_boxes(painter)
+        painter.setRenderHint(QPainter.RenderHint.Antialiasing, False)
+        self.draw_module_bounding_boxes(painter, visible)
+        painter.setRenderHint(QPainter.RenderHint.Antialiasing, antialiasing)
+
+        # Draw nodes first from one cached rendering per node appearance. Consecutive
+        # nodes that look the same go out in a single drawPixmapFragments call, which
+        # keeps the list (stacking) order while avoiding one blit call per node
+        scale = round(self.zoom_level * self.devicePixelRatioF(), 3)
+        run_pixmap = None
+        fragments = []
+        for node in self.get_nodes_in_rect(visible):
+            pixmap = self._get_node_pixmap(node, scale, antialiasing)
+            if pixmap is not run_pixmap:
+                if fragments:
+                    painter.drawPixmapFragments(fragments, run_pixmap)
+                    fragments = []
+                run_pixmap = pixmap
+                source = QRectF(pixmap.rect())
+                # Fragments are sized as source * scale; map device pixels back to canvas units
+                fragment_scale = node.get_bounding_rect().width() / pixmap.width()
+            fragments.append(QPainter.PixmapFragment.create(
+                QPointF(node.pos), source, fragment_scale, fragment_scale
+            ))
+        if fragments:
+            painter.drawPixmapFragments(fragments, run_pixmap)
+
+        # Draw connections last (so they appear above nodes). Unselected
+        # connections are batched into one path per color; selected ones are
+        # drawn individually on top with their thicker pen and handles
+        line_paths = {}
+        end_point_paths = {}
+        # {rgba: set of end point centers already in the path}; nodes with many
+        # wires of the same color would otherwise add one circle per wire
+        end_points_drawn = {}
+        selected_connections = []
+        for connection in self.get_connections_in_rect(visible):
+            if connection.selected:
+                selected_connections.append(connection)
+                continue
+            rgba = connection.color.rgba()
+            line_path = line_paths.get(rgba)
+            if line_path is None:
+                line_path = line_paths[rgba] = QPainterPath()
+                # Winding fill keeps overlapping end points on a shared node solid
+                end_point_paths[rgba] = QPainterPath()
+                end_point_paths[rgba].setFillRule(Qt.FillRule.WindingFill)
+                end_points_drawn[rgba] = set()
+            connection.add_line_to_path(line_path)
+            connection.add_end_points_to_path(end_point_paths[rgba], end_points_drawn[rgba])
+        
+        painter.setBrush(Qt.BrushStyle.NoBrush)
+        for rgba, line_path in line_paths.items():
+            painter.setPen(self._get_connection_style(rgba)[0])
+            painter.drawPath(line_path)
+        for rgba, end_point_path in end_point_paths.items():
+            _, end_point_pen, end_point_brush = self._get_connection_style(rgba)
+            painter.setBrush(end_point_brush)
+            painter.setPen(end_point_pen)
+            painter.drawPath(end_point_path)
+        
+        for connection in selected_connections:
+            connection.draw(painter)
 
-        # Draw nodes first
+    def _get_connection_style(self, rgba):
+        """Get the (line pen, end point pen, end point brush) for unselected connections of a color"""
+        style = self._connection_styles.get(rgba)
+        if style is None:
+            color = QColor.fromRgba(rgba)
+            style = self._connection_styles[rgba] = (QPen(color, 2), QPen(color, 1), QBrush(color))
+        return style
+
+    def _get_node_pixmap(self, node, scale, antialiasing):
+        """Get a cached rendering of the node at the given device scale"""
+        key = node.get_style_key() + (scale, antialiasing)
+        pixmap = self._node_pixmap_cache.get(key)
+        if pixmap is None:
+            if len(self._node_pixmap_cache) >= self.NODE_PIXMAP_CACHE_LIMIT:
+                self._node_pixmap_cache.clear()
+
+            # Render at device resolution so the blit is 1:1 with the screen
+            half = node.get_bounding_rect().width() / 2
+            size = max(1, math.ceil(2 * half * scale))
+            pixmap = QPixmap(size, size)
+            pixmap.fill(Qt.GlobalColor.transparent)
+
+            pixmap_painter = QPainter(pixmap)
+            pixmap_painter.setRenderHint(QPainter.RenderHint.Antialiasing, antialiasing)
+            pixmap_painter.scale(size / (2 * half), size / (2 * half))
+            node.draw_at(pixmap_painter, QPointF(half, half))
+            pixmap_painter.end()
+
+            self._node_pixmap_cache[key] = pixmap
+        return pixmap
+
+    def refresh_from_config(self):
+        """Re-read configuration dependent state after preferences change"""
+        config = get_config()
+        self._grid_color = config.get_grid_color()
+        self._antialiasing = config.is_antialiasing_enabled()
+        self._hitbox_distance = config.get_connection_hitbox_distance()
+        self._class_color_cache.clear()
         for node in self.nodes:
-            node.draw(painter)
-
-        # Draw connections last (so they appear above nodes)
+            node.refresh_from_config()
+        # Connections keep their own copy of the hit distance for is_point_on_line
         for connection in self.connections:
-            connection.draw(painter)
+            connection.HITBOX_DISTANCE = self._hitbox_distance
+        self.invalidate_indexes()
+        self._node_pixmap_cache.clear()
+        self.update()
 
-        painter.end()
+    def get_class_color(self, class_name):
+        """Get the configured (r, g, b) color for a node class"""
+        color = self._class_color_cache.get(class_name)
+        if color is None:
+            color = get_config().get_node_class_color(class_name)
+            self._class_color_cache[class_name] = color
+        return color
 
-    def draw_module_bounding_boxes(self, painter):
-        """Draw bounding boxes around selected modules"""
+    def draw_module_bounding_boxes(self, painter, area=None):
+        """Draw bounding boxes around selected modules, skipping them if outside a canvas area"""
         if not self.selected_module_id:
             return
         
         # Find all nodes and images belonging to the selected module
-        module_nodes = [node for node in self.nodes if hasattr(node, 'module_id') and node.module_id == self.selected_module_id]
-        module_images = [img for img in self.images if hasattr(img, 'module_instance_id') and getattr(img, 'module_instance_id', None) == self.selected_module_id]
+        module_nodes, module_images = self.get_module_members(self.selected_module_id)
         
         if not module_nodes and not module_images:
             return
         
-        # Collect all bounding points for accurate calculation
-        bounds_points = []
+        # Track the extent of every member in a single pass
+        min_x = min_y = math.inf
+        max_x = max_y = -math.inf
         
         # Include node bounds
         for node in module_nodes:
             node_radius = node.NODE_RADIUS
             node_x = node.pos.x()
             node_y = node.pos.y()
-            bounds_points.append((node_x - node_radius, node_y - node_radius))
-            bounds_points.append((node_x + node_radius, node_y + node_radius))
+            if node_x - node_radius < min_x:
+                min_x = node_x - node_radius
+            if node_x + node_radius > max_x:
+                max_x = node_x + node_radius
+            if node_y - node_radius < min_y:
+                min_y = node_y - node_radius
+            if node_y + node_radius > max_y:
+                max_y = node_y + node_radius
         
         # Include image bounds (using their actual rotated bounding rectangles)
         for image in module_images:
-            # Use the image's rect which accounts for rotation
+            # Use the image's rect which accounts for rotation (a no-op unless the image changed)
+            image.update_rect()
             img_rect = image.rect
-            bounds_points.append((img_rect.left(), img_rect.top()))
-            bounds_points.append((img_rect.right(), img_rect.bottom()))
-        
-        if not bounds_points:
-            return
-        
-        # Calculate min/max from all bounds points
-        min_x = min(p[0] for p in bounds_points)
-        max_x = max(p[0] for p in bounds_points)
-        min_y = min(p[1] for p in bounds_points)
-        max_y = max(p[1] for p in bounds_points)
+            left, top = img_rect.left(), img_rect.top()
+            right, bottom = img_rect.right(), img_rect.bottom()
+            if left < min_x:
+                min_x = left
+            if right > max_x:
+                max_x = right
+            if top < min_y:
+                min_y = top
+            if bottom > max_y:
+                max_y = bottom
         
         # Add padding around the bounding box
         padding = 10
@@ -1495,217 +2020,252 @@ class DiagramCanvas(QWidget):
         max_x += padding
         max_y += padding
         
-        # Draw the bounding box
-        config = get_config()
+        box = QRect(int(min_x), int(min_y), int(max_x - min_x), int(max_y - min_y))
+        if area is not None and not area.intersects(QRectF(box)):
+            return
         
+        # Draw the bounding box
         # Draw a light highlight rectangle as background
         highlight_color = QColor(100, 150, 255, 30)  # Light blue with transparency
-        painter.fillRect(int(min_x), int(min_y), int(max_x - min_x), int(max_y - min_y), highlight_color)
+        painter.fillRect(box, highlight_color)
         
         # Draw the border
         border_color = QColor(100, 150, 255, 200)  # Solid blue
         border_width = 2
         painter.setPen(QPen(border_color, border_width))
-        painter.drawRect(int(min_x), int(min_y), int(max_x - min_x), int(max_y - min_y))
+        painter.drawRect(box)
 
-    def draw_grid(self, painter):
+    def draw_grid(self, painter, area=None):
         """Draw an infinite grid on the canvas in canvas coordinates"""
-        config = get_config()
-        grid_color = config.get_grid_color()
-        painter.setPen(QPen(QColor(*grid_color), 1))
+        grid_color = self._grid_color
         
-        # Get visible area in canvas coordinates
+        # Only the requested canvas area (by default the whole viewport) needs grid lines.
         # The painter has already been translated and scaled, so we work in canvas space
-        top_left_screen = QPoint(0, 0)
-        bottom_right_screen = QPoint(self.width(), self.height())
-        
-        # Convert to canvas coordinates (accounting for pan and zoom)
-        top_left_canvas = self.screen_to_canvas(top_left_screen)
-        bottom_right_canvas = self.screen_to_canvas(bottom_right_screen)
-        
-        # Find grid boundaries
-        min_x = int(top_left_canvas.x() / self.grid_size) * self.grid_size
-        max_x = int(bottom_right_canvas.x() / self.grid_size) * self.grid_size + self.grid_size
-        min_y = int(top_left_canvas.y() / self.grid_size) * self.grid_size
-        max_y = int(bottom_right_canvas.y() / self.grid_size) * self.grid_size + self.grid_size
-        
-        # Draw vertical lines in canvas coordinates
-        x = min_x
-        while x <= max_x:
-            painter.drawLine(x, int(min_y), x, int(max_y))
-            x += self.grid_size
-        
-        # Draw horizontal lines in canvas coordinates
-        y = min_y
-        while y <= max_y:
-            painter.drawLine(int(min_x), y, int(max_x), y)
-            y += self.grid_size
+        if area is None:
+            area = self.screen_to_canvas_rect(self.rect())
+        
+        # Keep the grid size integral (a saved grid size may be a float) so
+        # tiles start on whole multiples of it
+        size = max(int(self.grid_size), 1)
+        dpr = self.devicePixelRatioF()
+        scale = round(self.zoom_level * dpr, 3)
+        # Pack enough cells into the tile to make it at least GRID_TILE_MIN_SIZE device pixels wide
+        cells = max(1, math.ceil(self.GRID_TILE_MIN_SIZE / (size * scale)))
+        tile = self._get_grid_tile(grid_color, size, cells, scale)
+        tile_span = size * cells
+        
+        # Place one tile per block of cells covering the area, in device pixels. Each
+        # tile origin is rounded on its own so fractional cell widths never accumulate
+        device_scale = self.zoom_level * dpr
+        half = tile.width() / 2
+        xs = [
+            round(i * tile_span * device_scale + self.pan_offset.x() * dpr) + half
+            for i in range(math.floor(area.left() / tile_span), math.floor(area.right() / tile_span) + 1)
+        ]
+        ys = [
+            round(i * tile_span * device_scale + self.pan_offset.y() * dpr) + half
+            for i in range(math.floor(area.top() / tile_span), math.floor(area.bottom() / tile_span) + 1)
+        ]
+        source = QRectF(tile.rect())
+        fragments = [QPainter.PixmapFragment.create(QPointF(x, y), source) for y in ys for x in xs]
+        
+        # Blit 1:1 with the device instead of resampling the tile through the zoom
+        painter.save()
+        painter.setWorldTransform(QTransform.fromScale(1 / dpr, 1 / dpr))
+        painter.drawPixmapFragments(fragments, tile)
+        painter.restore()
+
+    def _get_grid_tile(self, grid_color, size, cells, scale):
+        """Get the pixmap for a block of grid cells at the given device scale, rebuilding it if the grid changed"""
+        key = (size, cells, scale, grid_color)
+        if self._grid_tile is None or self._grid_tile_key != key:
+            tile_size = max(1, math.ceil(size * cells * scale))
+            tile = QPixmap(tile_size, tile_size)
+            tile.fill(Qt.GlobalColor.transparent)
+            
+            # Draw the top and left edge of every cell on whole device pixels;
+            # tiling produces the full grid
+            tile_painter = QPainter(tile)
+            tile_painter.setPen(QPen(QColor(*grid_color), 1))
+            for cell in range(cells):
+                offset = round(cell * size * scale)
+                tile_painter.drawLine(0, offset, tile_size - 1, offset)
+                tile_painter.drawLine(offset, 0, offset, tile_size - 1)
+            tile_painter.end()
+            
+            self._grid_tile = tile
+            self._grid_tile_key = key
+        return self._grid_tile
 
     def export_diagram(self):
         """Export the diagram as a dictionary for saving"""
-        print(f"\n[DEBUG export_diagram] Starting export with {len(self.nodes)} total nodes, {len(self.images)} total images")
-        
-        diagram_data = {
-            "nodes": [],
-            "connections": [],
-            "images": [],
-            "modules": [],
-            "metadata": {
-                "grid_enabled": self.show_grid,
-                "grid_size": self.grid_size,
-                "snap_to_grid": self.snap_to_grid,
-                "zoom_level": self.zoom_level,
-                "pan_offset": {
-                    "x": self.pan_offset.x(),
-                    "y": self.pan_offset.y()
-                }
+        buf = io.StringIO()
+        self.export_diagram_stream(buf)
+        return json.loads(buf.getvalue())
+
+    def export_diagram_stream(self, fp):
+        """Write the diagram as JSON to a file object, one element at a time"""
+        node_indices = {id(node): i for i, node in enumerate(self.nodes)}
+
+        fp.write('{\n"nodes": [')
+        self._write_json_items(fp, (self._node_to_dict(node) for node in self.nodes))
+        fp.write('],\n"connections": [')
+        self._write_json_items(fp, (self._connection_to_dict(conn, node_indices) for conn in self.connections))
+        fp.write('],\n"images": [')
+        self._write_json_items(fp, (image.to_dict() for image in self.images))
+        fp.write('],\n"modules": [],\n"metadata": ')
+        json.dump(self._export_metadata(), fp)
+        fp.write('\n}\n')
+
+    @staticmethod
+    def _write_json_items(fp, items):
+        """Write JSON values separated by commas, one per line"""
+        separator = "\n"
+        for item in items:
+            fp.write(separator)
+            json.dump(item, fp)
+            separator = ",\n"
+
+    def _export_metadata(self):
+        """Get the view settings saved alongside the diagram"""
+        return {
+            "grid_enabled": self.show_grid,
+            "grid_size": self.grid_size,
+            "snap_to_grid": self.snap_to_grid,
+            "zoom_level": self.zoom_level,
+            "pan_offset": {
+                "x": self.pan_offset.x(),
+                "y": self.pan_offset.y()
             }
         }
 
-        # Export nodes
-        for node in self.nodes:
-            diagram_data["nodes"].append({
-                "name": node.name,
-                "x": node.pos.x(),
-                "y": node.pos.y(),
-                "class": node.node_class,
-                "color": {
-                    "r": node.color.red(),
-                    "g": node.color.green(),
-                    "b": node.color.blue()
-                },
-                "module_id": getattr(node, 'module_id', None),
-                "locked": getattr(node, 'locked', False)
-            })
-        
-        print(f"[DEBUG] Exported {len(diagram_data['nodes'])} nodes:")
-        for node_data in diagram_data["nodes"]:
-            if node_data.get("module_id"):
-                print(f"  - Node '{node_data['name']}' has module_id: {node_data['module_id']}")
-            else:
-                print(f"  - Node '{node_data['name']}' has NO module_id")
+    @staticmethod
+    def _node_to_dict(node):
+        """Convert a node to its saved representation"""
+        return {
+            "name": node.name,
+            "x": node.pos.x(),
+            "y": node.pos.y(),
+            "class": node.node_class,
+            "color": {
+                "r": node.color.red(),
+                "g": node.color.green(),
+                "b": node.color.blue()
+            },
+            "module_id": node.module_id,
+            "locked": node.locked
+        }
 
-        # Export connections
-        for connection in self.connections:
-            # Find the indices of the connected nodes
-            node1_idx = self.nodes.index(connection.node1)
-            node2_idx = self.nodes.index(connection.node2)
-            
+    @staticmethod
+    def _connection_to_dict(connection, node_indices):
+        """Convert a connection to its saved representation"""
+        return {
+            "node1": node_indices[id(connection.node1)],
+            "node2": node_indices[id(connection.node2)],
+            "color": {
+                "r": connection.color.red(),
+                "g": connection.color.green(),
+                "b": connection.color.blue()
+            },
+            "orthogonal": connection.orthogonal,
             # Save waypoints for orthogonal connections
-            waypoints_data = []
-            for waypoint in connection.waypoints:
-                waypoints_data.append({
-                    "x": waypoint.x(),
-                    "y": waypoint.y()
-                })
-            
-            diagram_data["connections"].append({
-                "node1": node1_idx,
-                "node2": node2_idx,
-                "color": {
-                    "r": connection.color.red(),
-                    "g": connection.color.green(),
-                    "b": connection.color.blue()
-                },
-                "orthogonal": connection.orthogonal,
-                "waypoints": waypoints_data
-            })
-
-        # Export images
-        for image in self.images:
-            diagram_data["images"].append(image.to_dict())
-        
-        print(f"[DEBUG] Exported {len(diagram_data['images'])} images")
-        for image_data in diagram_data["images"]:
-            if image_data.get("module_instance_id"):
-                print(f"  - Image has module_instance_id: {image_data['module_instance_id']}")
+            "waypoints": [{"x": wp.x(), "y": wp.y()} for wp in connection.waypoints]
+        }
 
-        return diagram_data
+    @staticmethod
+    def _is_node_index(index, node_count):
+        """Check whether a saved connection endpoint refers to an imported node"""
+        return isinstance(index, int) and 0 <= index < node_count
+
+    @staticmethod
+    def _node_from_dict(node_data):
+        """Create a node from its saved representation"""
+        node = Node(
+            node_data["name"],
+            QPoint(int(node_data["x"]), int(node_data["y"]))
+        )
+        
+        # Restore class if available
+        if "class" in node_data:
+            node.node_class = node_data["class"]
+        
+        # Restore color if available in the saved data
+        color = node_data.get("color")
+        if color is not None:
+            node.color = get_color((color["r"], color["g"], color["b"]))
+        
+        # Restore module information if available
+        if "module_id" in node_data:
+            node.module_id = node_data["module_id"]
+        if "locked" in node_data:
+            node.locked = node_data["locked"]
+        return node
+
+    @staticmethod
+    def _connection_from_dict(conn_data, nodes):
+        """Create a connection from its saved representation"""
+        # Restore routing type if available, default to False for backward compatibility
+        is_orthogonal = conn_data.get("orthogonal", False)
+        
+        # Restore waypoints if available; the default route is only generated when none were saved
+        waypoints = None
+        if "waypoints" in conn_data and is_orthogonal:
+            waypoints = [QPoint(int(wp["x"]), int(wp["y"])) for wp in conn_data["waypoints"]]
+        connection = Connection(
+            nodes[conn_data["node1"]], nodes[conn_data["node2"]],
+            orthogonal=is_orthogonal, waypoints=waypoints
+        )
+        
+        # Restore color if available in the saved data
+        color = conn_data.get("color")
+        if color is not None:
+            connection.color = get_color((color["r"], color["g"], color["b"]))
+        return connection
 
     def import_diagram(self, data):
         """Import a diagram from a dictionary"""
-        try:
-            self.clear()
-
-            # Import metadata (grid, zoom, pan settings)
-            metadata = data.get("metadata", {})
-            self.show_grid = metadata.get("grid_enabled", True)
-            self.grid_size = metadata.get("grid_size", 10)
-            self.snap_to_grid = metadata.get("snap_to_grid", False)
-            self.zoom_level = metadata.get("zoom_level", 1.0)
-            
-            pan_data = metadata.get("pan_offset", {"x": 0, "y": 0})
-            self.pan_offset = QPoint(pan_data.get("x", 0), pan_data.get("y", 0))
-
-            # Import nodes
-            node_map = {}
-            for node_data in data.get("nodes", []):
-                node = Node(
-                    node_data["name"],
-                    QPoint(int(node_data["x"]), int(node_data["y"]))
-                )
-                
-                # Restore class if available
-                if "class" in node_data:
-                    node.node_class = node_data["class"]
-                
-                # Restore color if available in the saved data
-                if "color" in node_data:
-                    node.color = QColor(
-                        node_data["color"]["r"],
-                        node_data["color"]["g"],
-                        node_data["color"]["b"]
-                    )
-                
-                # Restore module information if available
-                if "module_id" in node_data:
-                    node.module_id = node_data["module_id"]
-                if "locked" in node_data:
-                    node.locked = node_data["locked"]
+        with self.batch_updates():
+            try:
+                self.clear()
+
+                # Import metadata (grid, zoom, pan settings)
+                metadata = data.get("metadata", {})
+                self.show_grid = metadata.get("grid_enabled", True)
+                self.grid_size = metadata.get("grid_size", 10)
+                self.snap_to_grid = metadata.get("snap_to_grid", False)
+                self.set_zoom(metadata.get("zoom_level", 1.0))
                 
-                self.nodes.append(node)
-                node_map[len(self.nodes) - 1] = node
-                # Update node counter
-                if node_data["name"].startswith("Node"):
-                    try:
-                        num = int(node_data["name"][4:])
-                        self.node_counter = max(self.node_counter, num)
-                    except ValueError:
-                        pass
-
-            # Import connections
-            for conn_data in data.get("connections", []):
-                node1_idx = conn_data["node1"]
-                node2_idx = conn_data["node2"]
-                if node1_idx in node_map and node2_idx in node_map:
-                    # Restore routing type if available, default to False for backward compatibility
-                    is_orthogonal = conn_data.get("orthogonal", False)
-                    connection = Connection(node_map[node1_idx], node_map[node2_idx], orthogonal=is_orthogonal)
-                    
-                    # Restore color if available in the saved data
-                    if "color" in conn_data:
-                        connection.color = QColor(
-                            conn_data["color"]["r"],
-                            conn_data["color"]["g"],
-                            conn_data["color"]["b"]
-                        )
-                    
-                    # Restore waypoints if available
-                    if "waypoints" in conn_data and is_orthogonal:
-                        connection.waypoints = []
-                        for wp_data in conn_data["waypoints"]:
-                            connection.waypoints.append(QPoint(int(wp_data["x"]), int(wp_data["y"])))
-                    
-                    self.connections.append(connection)
-
-            # Import images
-            for image_data in data.get("images", []):
-                image = Image.from_dict(image_data)
-                self.images.append(image)
-
-            self.update()
-            return True
-        except Exception as e:
-            print(f"Error importing diagram: {e}")
-            return False
+                pan_data = metadata.get("pan_offset", {"x": 0, "y": 0})
+                self.pan_offset = QPoint(pan_data.get("x", 0), pan_data.get("y", 0))
+
+                # Import nodes; a connection's node index is its position in this list
+                node_data_list = data.get("nodes", [])
+                new_nodes = [self._node_from_dict(node_data) for node_data in node_data_list]
+                self.nodes.extend(new_nodes)
+
+                # Update node counter from the highest "NodeN" name
+                name_matches = map(_NODE_NUM_RE.match, (node_data["name"] for node_data in node_data_list))
+                max_num = max((int(m.group(1)) for m in name_matches if m), default=0)
+                self.node_counter = max(self.node_counter, max_num)
+
+                # Import connections, skipping any that reference missing nodes
+                node_count = len(new_nodes)
+                self.connections.extend([
+                    self._connection_from_dict(conn_data, new_nodes)
+                    for conn_data in data.get("connections", [])
+                    if self._is_node_index(conn_data["node1"], node_count)
+                    and self._is_node_index(conn_data["node2"], node_count)
+                ])
+
+                # Import images
+                for image_data in data.get("images", []):
+                    image = Image.from_dict(image_data)
+                    self.images.append(image)
+
+                self.invalidate_indexes()
+                self.update()
+                return True
+            except Exception as e:
+                print(f"Error importing diagram: {e}")
+                return False
 
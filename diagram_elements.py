@@ -2,20 +2,49 @@
 Basic diagram elements - nodes and connections
 """
 
-from PyQt5.QtCore import QPoint, QRect, QRectF, QSize, Qt
-from PyQt5.QtGui import QPainter, QPen, QBrush, QColor, QFont, QPixmap
+import math
+from PyQt5.QtCore import QPoint, QPointF, QRect, QRectF, QSize, Qt
+from PyQt5.QtGui import QPainter, QPen, QBrush, QColor, QFont, QPixmap, QPolygon
 from PyQt5.QtSvg import QSvgRenderer
 from config_loader import get_config
 
 
+# Shared QColor per RGB(A) tuple. Element colors are only ever replaced, never
+# modified in place, so equal colors can safely share one instance.
+_COLOR_CACHE = {}
+
+
+def get_color(rgb):
+    """Get the shared QColor for an (r, g, b) or (r, g, b, a) sequence"""
+    key = tuple(rgb)
+    color = _COLOR_CACHE.get(key)
+    if color is None:
+        color = _COLOR_CACHE[key] = QColor(*key)
+    return color
+
+
 class Node:
     """Represents a node in the wire diagram"""
 
+    __slots__ = (
+        'NODE_SIZE', 'NODE_RADIUS', 'BORDER_EXTENT', 'name', 'pos', 'highlighted',
+        'selected', 'module_id', 'locked', 'node_class', 'color'
+    )
+
+    # Config-derived values shared by every node, re-read when the config reloads
+    _defaults = None
+    _defaults_revision = None
+    # (normal, selected, none) border pens shared by every node, rebuilt when the config reloads
+    _pens = None
+    _pens_revision = None
+
     def __init__(self, name, pos):
         """Initialize a node"""
-        config = get_config()
-        self.NODE_SIZE = config.get_node_size()
-        self.NODE_RADIUS = self.NODE_SIZE // 2
+        size, border_extent, default_class, default_color = Node._get_defaults()
+        self.NODE_SIZE = size
+        self.NODE_RADIUS = size // 2
+        # Widest border the node can be drawn with (used for repaint bounds)
+        self.BORDER_EXTENT = border_extent
         
         self.name = name
         self.pos = pos
@@ -23,30 +52,54 @@ class Node:
         self.selected = False
         self.module_id = None  # Track which module this node belongs to
         self.locked = False  # Locked nodes cannot be dragged (part of a module)
-        # Get default class (first one in the list)
-        class_names = config.get_node_class_names()
-        self.node_class = class_names[0] if class_names else "Generic"
-        # Color is determined by class
-        color_tuple = config.get_node_class_color(self.node_class)
-        self.color = QColor(*color_tuple)
-        self.update_rect()
+        # Default class is the first one in the list; color is determined by class
+        self.node_class = default_class
+        self.color = get_color(default_color)
 
-    def update_rect(self):
-        """Update the bounding rectangle of the node"""
-        size = self.NODE_SIZE
-        self.rect = QRect(
-            int(self.pos.x() - size // 2),
-            int(self.pos.y() - size // 2),
-            size,
-            size
-        )
+    @staticmethod
+    def _get_defaults():
+        """Get (size, border extent, default class, default class color) from the config"""
+        config = get_config()
+        revision = config.get_revision()
+        if Node._defaults_revision != revision:
+            class_names = config.get_node_class_names()
+            default_class = class_names[0] if class_names else "Generic"
+            Node._defaults = (
+                config.get_node_size(),
+                max(config.get_node_border_width(), config.get_node_selected_border_width()),
+                default_class,
+                config.get_node_class_color(default_class)
+            )
+            Node._defaults_revision = revision
+        return Node._defaults
+
+    @staticmethod
+    def _get_border_pens():
+        """Get the (normal, selected, none) border pens from the config"""
+        config = get_config()
+        revision = config.get_revision()
+        if Node._pens_revision != revision:
+            no_pen = QPen()
+            no_pen.setStyle(Qt.PenStyle.NoPen)
+            Node._pens = (
+                QPen(get_color(config.get_node_border_color()), config.get_node_border_width()),
+                QPen(get_color(config.get_node_border_color_selected()), config.get_node_selected_border_width()),
+                no_pen
+            )
+            Node._pens_revision = revision
+        return Node._pens
 
     def refresh_from_config(self):
         """Refresh node properties from current config"""
-        config = get_config()
-        self.NODE_SIZE = config.get_node_size()
-        self.NODE_RADIUS = self.NODE_SIZE // 2
-        self.update_rect()
+        size, border_extent = Node._get_defaults()[:2]
+        self.NODE_SIZE = size
+        self.NODE_RADIUS = size // 2
+        self.BORDER_EXTENT = border_extent
+
+    def get_bounding_rect(self):
+        """Get the area covered by the node when drawn, including its border"""
+        half = self.NODE_RADIUS + self.BORDER_EXTENT
+        return QRectF(self.pos.x() - half, self.pos.y() - half, 2 * half, 2 * half)
 
     def set_highlighted(self, highlighted):
         """Set highlight state"""
@@ -56,36 +109,45 @@ class Node:
         """Set selection state"""
         self.selected = selected
 
+    def get_style_key(self):
+        """Get a hashable key for everything that affects how the node looks"""
+        if self.locked:
+            state = "locked"
+        elif self.selected or self.highlighted:
+            state = "selected"
+        else:
+            state = "normal"
+        return (self.color.rgba(), self.NODE_SIZE, state)
+
+    def contains_point(self, pos):
+        """Check if a point is inside the node's square, computed from its current position"""
+        left = self.pos.x() - self.NODE_SIZE // 2
+        top = self.pos.y() - self.NODE_SIZE // 2
+        return (left <= pos.x() < left + self.NODE_SIZE and
+                top <= pos.y() < top + self.NODE_SIZE)
+
     def draw(self, painter):
         """Draw the node"""
-        config = get_config()
-        self.update_rect()
+        self.draw_at(painter, self.pos)
+
+    def draw_at(self, painter, center):
+        """Draw the node's circle centred on the given point"""
+        normal_pen, selected_pen, no_pen = Node._get_border_pens()
 
         # Always use the node's actual color for the fill
         painter.setBrush(QBrush(self.color))
         
         # Don't draw border for locked (module) nodes
         if self.locked:
-            # Set pen style to NoPen for locked nodes
-            pen = QPen()
-            pen.setStyle(Qt.PenStyle.NoPen)
-            painter.setPen(pen)
-        # Draw border based on state
-        elif self.selected:
-            border_color = config.get_node_border_color_selected()
-            border_width = config.get_node_selected_border_width()
-            painter.setPen(QPen(QColor(*border_color), border_width))
-        elif self.highlighted:
-            # Highlighted (hovering over while making connection) - use a brighter outline
-            border_color = config.get_node_border_color_selected()
-            border_width = config.get_node_selected_border_width()
-            painter.setPen(QPen(QColor(*border_color), border_width))
+            painter.setPen(no_pen)
+        # Draw border based on state; highlighted (hovering over while
+        # making a connection) uses the same brighter outline as selected
+        elif self.selected or self.highlighted:
+            painter.setPen(selected_pen)
         else:
-            border_color = config.get_node_border_color()
-            border_width = config.get_node_border_width()
-            painter.setPen(QPen(QColor(*border_color), border_width))
+            painter.setPen(normal_pen)
         
-        painter.drawEllipse(self.pos, self.NODE_RADIUS, self.NODE_RADIUS)
+        painter.drawEllipse(center, self.NODE_RADIUS, self.NODE_RADIUS)
 
     def get_center(self):
         """Get the center point of the node"""
@@ -95,26 +157,58 @@ class Node:
 class Connection:
     """Represents a wire connection between two nodes"""
 
-    def __init__(self, node1, node2, orthogonal=False):
-        """Initialize a connection"""
-        config = get_config()
-        self.HITBOX_DISTANCE = config.get_connection_hitbox_distance()
+    __slots__ = (
+        'HITBOX_DISTANCE', 'WAYPOINT_RADIUS', 'node1', 'node2', 'selected', 'orthogonal',
+        'color', 'waypoints', 'dragging_waypoint', '_bounds', '_segments', '_hit_spans', '_hit_line'
+    )
+
+    # Config-derived values shared by every connection, re-read when the config reloads
+    _defaults = None
+    _defaults_revision = None
+
+    def __init__(self, node1, node2, orthogonal=False, waypoints=None):
+        """Initialize a connection, optionally with known waypoints (orthogonal routing only)"""
+        hitbox_distance, default_color = Connection._get_defaults()
+        self.HITBOX_DISTANCE = hitbox_distance
         self.WAYPOINT_RADIUS = 5  # Radius of waypoint handles
         
         self.node1 = node1
         self.node2 = node2
         self.selected = False
         self.orthogonal = orthogonal  # True for H/V routing, False for direct line
-        color_tuple = config.get_connection_default_color()
-        self.color = QColor(*color_tuple)
+        self.color = get_color(default_color)
         
-        # Waypoints for orthogonal routing (list of QPoints)
+        # Waypoints for orthogonal routing (list of QPoints); only generate the
+        # default route when the caller is not about to supply one
         self.waypoints = []
         if self.orthogonal:
-            self._generate_initial_waypoints()
+            if waypoints is not None:
+                self.waypoints = waypoints
+            else:
+                self._generate_initial_waypoints()
         
         # Track which waypoint is being dragged
         self.dragging_waypoint = None
+        
+        # Cached results of get_bounding_rect, _get_orthogonal_segments, _get_hit_spans
+        # and _get_hit_line; cleared by invalidate_bounds when an end node or waypoint moves
+        self._bounds = None
+        self._segments = None
+        self._hit_spans = None
+        self._hit_line = None
+
+    @staticmethod
+    def _get_defaults():
+        """Get (hitbox distance, default color) from the config"""
+        config = get_config()
+        revision = config.get_revision()
+        if Connection._defaults_revision != revision:
+            Connection._defaults = (
+                config.get_connection_hitbox_distance(),
+                config.get_connection_default_color()
+            )
+            Connection._defaults_revision = revision
+        return Connection._defaults
 
     def _generate_initial_waypoints(self):
         """Generate initial waypoints for orthogonal routing"""
@@ -151,52 +245,77 @@ class Connection:
     def _is_point_on_direct_line(self, point):
         """Check if a point is close to a direct line connection"""
         x0, y0 = point.x(), point.y()
-        x1, y1 = self.node1.get_center().x(), self.node1.get_center().y()
-        x2, y2 = self.node2.get_center().x(), self.node2.get_center().y()
+        min_x, min_y, max_x, max_y, dx, dy, cross, den_sq = self._get_hit_line()
+        hitbox = self.HITBOX_DISTANCE
 
-        # Calculate distance from point to line segment
-        num = abs((y2 - y1) * x0 - (x2 - x1) * y0 + x2 * y1 - y2 * x1)
-        den = ((y2 - y1) ** 2 + (x2 - x1) ** 2) ** 0.5
-        
-        if den == 0:
+        # Reject points outside the line's bounding box before any distance math
+        if not (min_x - hitbox <= x0 <= max_x + hitbox and min_y - hitbox <= y0 <= max_y + hitbox):
             return False
-        
-        distance = num / den
-        
-        # Check if point is within the bounding box of the line
-        min_x = min(x1, x2)
-        max_x = max(x1, x2)
-        min_y = min(y1, y2)
-        max_y = max(y1, y2)
-        
-        in_bounds = min_x - self.HITBOX_DISTANCE <= x0 <= max_x + self.HITBOX_DISTANCE and \
-                    min_y - self.HITBOX_DISTANCE <= y0 <= max_y + self.HITBOX_DISTANCE
-        
-        return distance <= self.HITBOX_DISTANCE and in_bounds
+
+        # Compare squared distances from the point to the line to avoid the square root
+        if den_sq == 0:
+            return False
+        num = dy * x0 - dx * y0 + cross
+        return num * num <= hitbox * hitbox * den_sq
+
+    def _get_hit_line(self):
+        """Get (min_x, min_y, max_x, max_y, dx, dy, cross term, squared length) of the direct line (cached)"""
+        if self._hit_line is None:
+            c1 = self.node1.get_center()
+            c2 = self.node2.get_center()
+            x1, y1 = c1.x(), c1.y()
+            x2, y2 = c2.x(), c2.y()
+            dx = x2 - x1
+            dy = y2 - y1
+            self._hit_line = (
+                min(x1, x2), min(y1, y2), max(x1, x2), max(y1, y2),
+                dx, dy, x2 * y1 - y2 * x1, dx * dx + dy * dy
+            )
+        return self._hit_line
 
     def _is_point_on_orthogonal_line(self, point):
         """Check if a point is close to orthogonal line segments"""
-        segments = self._get_orthogonal_segments()
-        
-        for seg_start, seg_end in segments:
-            x0, y0 = point.x(), point.y()
-            x1, y1 = seg_start.x(), seg_start.y()
-            x2, y2 = seg_end.x(), seg_end.y()
-            
-            # For axis-aligned lines, check perpendicular distance
-            if x1 == x2:  # Vertical line
-                if min(y1, y2) - self.HITBOX_DISTANCE <= y0 <= max(y1, y2) + self.HITBOX_DISTANCE:
-                    if abs(x0 - x1) <= self.HITBOX_DISTANCE:
-                        return True
-            else:  # Horizontal line
-                if min(x1, x2) - self.HITBOX_DISTANCE <= x0 <= max(x1, x2) + self.HITBOX_DISTANCE:
-                    if abs(y0 - y1) <= self.HITBOX_DISTANCE:
-                        return True
-        
+        x0, y0 = point.x(), point.y()
+        hitbox = self.HITBOX_DISTANCE
+
+        min_x, min_y, max_x, max_y, spans = self._get_hit_spans()
+        # Reject points outside the whole route's bounding box before checking each segment
+        if not (min_x - hitbox <= x0 <= max_x + hitbox and min_y - hitbox <= y0 <= max_y + hitbox):
+            return False
+
+        # For axis-aligned lines, check perpendicular distance, then the extent along the line
+        for vertical, fixed, low, high in spans:
+            if vertical:
+                if abs(x0 - fixed) <= hitbox and low - hitbox <= y0 <= high + hitbox:
+                    return True
+            elif abs(y0 - fixed) <= hitbox and low - hitbox <= x0 <= high + hitbox:
+                return True
+
         return False
 
+    def _get_hit_spans(self):
+        """Get (min_x, min_y, max_x, max_y, spans) of the orthogonal route, with each segment
+        as a (vertical, fixed coordinate, low, high) tuple (cached)"""
+        if self._hit_spans is None:
+            spans = []
+            xs = []
+            ys = []
+            for seg_start, seg_end in self._get_orthogonal_segments():
+                x1, y1 = seg_start.x(), seg_start.y()
+                x2, y2 = seg_end.x(), seg_end.y()
+                xs += (x1, x2)
+                ys += (y1, y2)
+                if x1 == x2:  # Vertical line
+                    spans.append((True, x1, min(y1, y2), max(y1, y2)))
+                else:  # Horizontal line
+                    spans.append((False, y1, min(x1, x2), max(x1, x2)))
+            self._hit_spans = (min(xs), min(ys), max(xs), max(ys), spans)
+        return self._hit_spans
+
     def _get_orthogonal_segments(self):
-        """Get list of line segments for orthogonal routing"""
+        """Get list of line segments for orthogonal routing (cached; do not modify)"""
+        if self._segments is not None:
+            return self._segments
         segments = []
         p1 = self.node1.get_center()
         
@@ -210,8 +329,48 @@ class Connection:
         p2 = self.node2.get_center()
         segments.append((current, p2))
         
+        self._segments = segments
         return segments
 
+    def invalidate_bounds(self):
+        """Forget the cached bounding rect and segments after an end node or waypoint moved"""
+        self._bounds = None
+        self._segments = None
+        self._hit_spans = None
+        self._hit_line = None
+
+    def get_bounding_rect(self):
+        """Get the area covered by the connection when drawn, including handles"""
+        if self._bounds is None:
+            points = [self.node1.get_center(), self.node2.get_center()] + self.waypoints
+            xs = [p.x() for p in points]
+            ys = [p.y() for p in points]
+            # Leave room for the thick selected pen, end dots and waypoint handles
+            margin = self.WAYPOINT_RADIUS + 2
+            self._bounds = QRectF(
+                min(xs) - margin,
+                min(ys) - margin,
+                max(xs) - min(xs) + 2 * margin,
+                max(ys) - min(ys) + 2 * margin
+            )
+        return QRectF(self._bounds)
+
+    def add_line_to_path(self, path):
+        """Append the connection's line, including any waypoints, to a painter path"""
+        path.moveTo(QPointF(self.node1.get_center()))
+        if self.orthogonal:
+            for wp in self.waypoints:
+                path.lineTo(QPointF(wp))
+        path.lineTo(QPointF(self.node2.get_center()))
+
+    def add_end_points_to_path(self, path, drawn):
+        """Append the connection's end point circles to a painter path, skipping centers in drawn"""
+        for center in (self.node1.get_center(), self.node2.get_center()):
+            key = (center.x(), center.y())
+            if key not in drawn:
+                drawn.add(key)
+                path.addEllipse(QPointF(center), 4, 4)
+
     def draw(self, painter):
         """Draw the connection"""
         if self.orthogonal:
@@ -221,51 +380,35 @@ class Connection:
 
     def _draw_direct(self, painter):
         """Draw direct line connection"""
-        if self.selected:
-            painter.setPen(QPen(self.color, 4))
-        else:
-            painter.setPen(QPen(self.color, 2))
-        
+        # One pen for the line and the end points; only its width changes
+        pen = QPen(self.color, 4 if self.selected else 2)
+        painter.setPen(pen)
         painter.drawLine(self.node1.get_center(), self.node2.get_center())
 
-        # Draw connection points as small circles
-        if self.selected:
-            painter.setBrush(QBrush(self.color))
-            painter.setPen(QPen(self.color, 2))
-        else:
-            painter.setBrush(QBrush(self.color))
-            painter.setPen(QPen(self.color, 1))
-        
-        painter.drawEllipse(self.node1.get_center(), 4, 4)
-        painter.drawEllipse(self.node2.get_center(), 4, 4)
+        self._draw_end_points(painter, pen)
 
     def _draw_orthogonal(self, painter):
         """Draw orthogonal (H/V) line connection"""
-        # Draw line segments
-        if self.selected:
-            painter.setPen(QPen(self.color, 4))
-        else:
-            painter.setPen(QPen(self.color, 2))
-        
-        segments = self._get_orthogonal_segments()
-        for seg_start, seg_end in segments:
-            painter.drawLine(seg_start, seg_end)
+        # Draw the whole route in one call, joined the same way as the batched
+        # unselected connections instead of one drawLine per segment
+        pen = QPen(self.color, 4 if self.selected else 2)
+        painter.setPen(pen)
+        painter.drawPolyline(QPolygon([self.node1.get_center()] + self.waypoints + [self.node2.get_center()]))
 
         # Draw waypoint handles if selected
         if self.selected:
-            painter.setBrush(QBrush(QColor(255, 100, 100)))
-            painter.setPen(QPen(QColor(200, 50, 50), 2))
+            painter.setBrush(QBrush(get_color((255, 100, 100))))
+            painter.setPen(QPen(get_color((200, 50, 50)), 2))
             for wp in self.waypoints:
                 painter.drawEllipse(wp, self.WAYPOINT_RADIUS, self.WAYPOINT_RADIUS)
 
-        # Draw connection points as small circles
-        if self.selected:
-            painter.setBrush(QBrush(self.color))
-            painter.setPen(QPen(self.color, 2))
-        else:
-            painter.setBrush(QBrush(self.color))
-            painter.setPen(QPen(self.color, 1))
-        
+        self._draw_end_points(painter, pen)
+
+    def _draw_end_points(self, painter, pen):
+        """Draw connection points as small circles, reusing the line's pen"""
+        pen.setWidth(2 if self.selected else 1)
+        painter.setBrush(QBrush(self.color))
+        painter.setPen(pen)
         painter.drawEllipse(self.node1.get_center(), 4, 4)
         painter.drawEllipse(self.node2.get_center(), 4, 4)
 
@@ -279,25 +422,32 @@ class Module:
         self.name = name
         self.nodes = []  # List of Node objects in this module
         self.images = []  # List of Image objects in this module
+        # Sets mirroring the lists so membership checks stay O(1) as modules grow
+        self._node_set = set()
+        self._image_set = set()
 
     def add_node(self, node):
         """Add a node to this module"""
-        if node not in self.nodes:
+        if node not in self._node_set:
+            self._node_set.add(node)
             self.nodes.append(node)
 
     def remove_node(self, node):
         """Remove a node from this module"""
-        if node in self.nodes:
+        if node in self._node_set:
+            self._node_set.discard(node)
             self.nodes.remove(node)
 
     def add_image(self, image):
         """Add an image to this module"""
-        if image not in self.images:
+        if image not in self._image_set:
+            self._image_set.add(image)
             self.images.append(image)
 
     def remove_image(self, image):
         """Remove an image from this module"""
-        if image in self.images:
+        if image in self._image_set:
+            self._image_set.discard(image)
             self.images.remove(image)
 
     def to_dict(self):
@@ -332,7 +482,7 @@ class Module:
             node = Node(node_data["name"], QPoint(int(node_data["pos"]["x"]), int(node_data["pos"]["y"])))
             node.node_class = node_data.get("class", "Generic")
             color_data = node_data.get("color", [255, 0, 0])
-            node.color = QColor(*color_data)
+            node.color = get_color(color_data)
             module.add_node(node)
         
         for image_data in module_dict.get("images", []):
@@ -346,6 +496,28 @@ class Module:
 class Image:
     """Represents an image on the canvas"""
 
+    __slots__ = (
+        'image_path', 'pos', 'width', 'height', 'selected', 'pixmap', 'svg_renderer',
+        'module_instance_id', 'locked', 'rotation', 'rect', '_rect_key',
+        '_scaled_pixmap', '_scaled_key', '_trig', '_target'
+    )
+
+    # (cos, sin) of 0, 90, 180 and 270 degrees
+    _QUARTER_TURN_TRIG = ((1, 0), (0, 1), (-1, 0), (0, -1))
+
+    # Largest width or height in device pixels of a cached SVG rendering; bigger ones are drawn directly
+    SVG_CACHE_MAX_SIZE = 2048
+
+    # Loaded image files by path, shared by all images (e.g. module instances) showing the same file.
+    # Failed loads are not cached so a file that appears later can still be loaded
+    _pixmap_cache = {}
+    _svg_cache = {}
+
+    # Resampled/rendered pixmaps keyed by (path, width, height[, scale]), shared by every image
+    # of the same file and size; cleared when it reaches SIZED_CACHE_LIMIT entries
+    _sized_cache = {}
+    SIZED_CACHE_LIMIT = 128
+
     def __init__(self, image_path, pos, width=100, height=100):
         """Initialize an image"""
         self.image_path = image_path
@@ -356,7 +528,17 @@ class Image:
         self.pixmap = None
         self.svg_renderer = None
         self.module_instance_id = None  # Track which module instance this image belongs to
+        self.locked = False  # Module images are moved only with their module
         self.rotation = 0  # Rotation angle in degrees (0-360)
+        # (x, y, width, height, rotation) that rect was last computed for
+        self._rect_key = None
+        # (rotation, cos, sin) of the last rotation the trig was computed for
+        self._trig = None
+        # Unrotated area the image is drawn into, refreshed by update_rect
+        self._target = None
+        # Pixmap resampled (raster) or rendered (SVG) at the image's size, and the key it was made for
+        self._scaled_pixmap = None
+        self._scaled_key = None
         
         # Load the image
         self.load_image()
@@ -364,68 +546,85 @@ class Image:
 
     def load_image(self):
         """Load the image from file"""
+        self._scaled_pixmap = None
+        self._scaled_key = None
         try:
             if self.image_path.lower().endswith('.svg'):
-                # Handle SVG images
-                self.svg_renderer = QSvgRenderer(self.image_path)
+                # Handle SVG images; every image of the same file shares one parsed renderer
+                renderer = Image._svg_cache.get(self.image_path)
+                if renderer is None:
+                    renderer = QSvgRenderer(self.image_path)
+                    if renderer.isValid():
+                        Image._svg_cache[self.image_path] = renderer
+                self.svg_renderer = renderer
             else:
-                # Handle PNG and other formats
-                self.pixmap = QPixmap(self.image_path)
-                if self.pixmap.isNull():
-                    print(f"Failed to load image: {self.image_path}")
+                # Handle PNG and other formats; decoded once per file (QPixmap is implicitly shared)
+                pixmap = Image._pixmap_cache.get(self.image_path)
+                if pixmap is None:
+                    pixmap = QPixmap(self.image_path)
+                    if pixmap.isNull():
+                        print(f"Failed to load image: {self.image_path}")
+                    else:
+                        Image._pixmap_cache[self.image_path] = pixmap
+                self.pixmap = pixmap
         except Exception as e:
             print(f"Error loading image {self.image_path}: {e}")
 
     def update_rect(self):
         """Update the bounding rectangle of the image based on rotation"""
-        import math
+        # Called on every draw and hit test; skip the trig when nothing changed
+        key = (self.pos.x(), self.pos.y(), self.width, self.height, self.rotation)
+        if key == self._rect_key:
+            return
+        self._rect_key = key
+        self._target = QRectF(int(self.pos.x()), int(self.pos.y()), int(self.width), int(self.height))
         
         # Calculate the actual axis-aligned bounding box of the rotated image
         center_x = self.pos.x() + self.width / 2
         center_y = self.pos.y() + self.height / 2
         
-        # Get the four corners in unrotated space
+        # Half extents of a rotated rectangle in closed form, instead of rotating all four corners
+        cos_a, sin_a = self._get_rotation_trig()
+        cos_a = abs(cos_a)
+        sin_a = abs(sin_a)
         half_w = self.width / 2
         half_h = self.height / 2
-        corners = [
-            (-half_w, -half_h),
-            (half_w, -half_h),
-            (half_w, half_h),
-            (-half_w, half_h),
-        ]
-        
-        # Rotate corners and find bounding box
-        angle_rad = math.radians(self.rotation)
-        cos_a = math.cos(angle_rad)
-        sin_a = math.sin(angle_rad)
-        
-        rotated_corners = []
-        for dx, dy in corners:
-            rotated_x = dx * cos_a - dy * sin_a
-            rotated_y = dx * sin_a + dy * cos_a
-            rotated_corners.append((rotated_x, rotated_y))
-        
-        # Find min/max x and y
-        xs = [x for x, y in rotated_corners]
-        ys = [y for x, y in rotated_corners]
-        
-        min_x = min(xs)
-        max_x = max(xs)
-        min_y = min(ys)
-        max_y = max(ys)
+        extent_x = half_w * cos_a + half_h * sin_a
+        extent_y = half_w * sin_a + half_h * cos_a
         
         # Convert to screen coordinates
         self.rect = QRect(
-            int(center_x + min_x),
-            int(center_y + min_y),
-            int(max_x - min_x),
-            int(max_y - min_y)
+            int(center_x - extent_x),
+            int(center_y - extent_y),
+            int(2 * extent_x),
+            int(2 * extent_y)
         )
 
+    def _get_rotation_trig(self):
+        """Get (cos, sin) of the rotation, recomputed only when the rotation changes"""
+        if self._trig is None or self._trig[0] != self.rotation:
+            quarter, remainder = divmod(self.rotation, 90)
+            if remainder == 0:
+                # Exact values for quarter turns; cos(90°) in floating point is 6e-17, not 0,
+                # which would push the closed-form extent across an integer boundary
+                cos_a, sin_a = self._QUARTER_TURN_TRIG[int(quarter) % 4]
+            else:
+                angle_rad = math.radians(self.rotation)
+                cos_a, sin_a = math.cos(angle_rad), math.sin(angle_rad)
+            self._trig = (self.rotation, cos_a, sin_a)
+        return self._trig[1], self._trig[2]
+
     def set_selected(self, selected):
         """Set selection state"""
         self.selected = selected
 
+    def get_bounding_rect(self):
+        """Get the area covered by the image when drawn, including handles"""
+        self.update_rect()
+        # Leave room for the selection border and resize handles
+        margin = 6
+        return QRectF(self.rect).adjusted(-margin, -margin, margin, margin)
+
     def get_resize_handle_at(self, pos, handle_size=12):
         """Check if position is on a resize handle. Returns 'tl', 'br', or None"""
         # Update rect first to ensure it's current
@@ -449,8 +648,6 @@ class Image:
 
     def is_point_inside(self, pos):
         """Check if a point is inside the rotated image bounding box"""
-        import math
-        
         # Get image center
         center_x = self.pos.x() + self.width / 2
         center_y = self.pos.y() + self.height / 2
@@ -458,54 +655,73 @@ class Image:
         # Translate point to center-based coordinates
         dx = pos.x() - center_x
         dy = pos.y() - center_y
+        half_w = self.width / 2
+        half_h = self.height / 2
         
-        # Rotate point back (negative rotation) to unrotated space
-        angle_rad = math.radians(-self.rotation)
-        cos_a = math.cos(angle_rad)
-        sin_a = math.sin(angle_rad)
+        # Quarter turns are plain rectangle tests, no trig needed
+        rotation = self.rotation % 360
+        if rotation == 0 or rotation == 180:
+            return abs(dx) <= half_w and abs(dy) <= half_h
+        if rotation == 90 or rotation == 270:
+            return abs(dx) <= half_h and abs(dy) <= half_w
         
-        rotated_dx = dx * cos_a - dy * sin_a
-        rotated_dy = dx * sin_a + dy * cos_a
+        # Reject points outside the circle that encloses any rotation
+        if dx * dx + dy * dy > half_w * half_w + half_h * half_h:
+            return False
+        
+        # Rotate point back (negative rotation) to unrotated space
+        cos_a, sin_a = self._get_rotation_trig()
+        rotated_dx = dx * cos_a + dy * sin_a
+        rotated_dy = dy * cos_a - dx * sin_a
         
         # Check if point is within unrotated rectangle bounds
-        return (abs(rotated_dx) <= self.width / 2 and 
-                abs(rotated_dy) <= self.height / 2)
+        return abs(rotated_dx) <= half_w and abs(rotated_dy) <= half_h
 
     def draw(self, painter):
         """Draw the image"""
         self.update_rect()
         
-        # Save painter state to restore after rotation
-        painter.save()
-        
-        # Calculate center point
-        center_x = self.pos.x() + self.width / 2
-        center_y = self.pos.y() + self.height / 2
+        # Device pixels per canvas unit, read before the rotation is applied
+        transform = painter.worldTransform()
+        scale = math.hypot(transform.m11(), transform.m12()) * painter.device().devicePixelRatioF()
         
-        # Apply rotation if needed
-        if self.rotation != 0:
+        # Apply rotation if needed; unrotated images leave the painter state alone,
+        # so they skip the save/restore round trip
+        rotated = self.rotation != 0
+        if rotated:
+            # Save painter state to restore after rotation
+            painter.save()
+            
+            # Rotate around the center point
+            center_x = self.pos.x() + self.width / 2
+            center_y = self.pos.y() + self.height / 2
             painter.translate(center_x, center_y)
             painter.rotate(self.rotation)
             painter.translate(-center_x, -center_y)
+            # Keep rotated blits smooth
+            painter.setRenderHint(QPainter.RenderHint.SmoothPixmapTransform)
         
         # Draw the image
         if self.svg_renderer and self.svg_renderer.isValid():
-            rect_f = QRectF(int(self.pos.x()), int(self.pos.y()), int(self.width), int(self.height))
-            self.svg_renderer.render(painter, rect_f)
+            rect_f = self._target
+            svg_pixmap = self._get_svg_pixmap(scale)
+            if svg_pixmap is not None:
+                painter.drawPixmap(rect_f, svg_pixmap, QRectF(svg_pixmap.rect()))
+            else:
+                self.svg_renderer.render(painter, rect_f)
         elif self.pixmap:
-            # Scale pixmap to fit within the specified width and height while maintaining aspect ratio
-            scaled_pixmap = self.pixmap.scaledToWidth(int(self.width), Qt.SmoothTransformation)
-            # If scaled height exceeds desired height, scale by height instead
-            if scaled_pixmap.height() > int(self.height):
-                scaled_pixmap = self.pixmap.scaledToHeight(int(self.height), Qt.SmoothTransformation)
-            painter.drawPixmap(self.pos, scaled_pixmap)
+            painter.drawPixmap(self.pos, self._get_scaled_pixmap())
         
         # Restore painter state
-        painter.restore()
+        if rotated:
+            painter.restore()
         
-        # Draw selection border and handles using axis-aligned rect (not rotated)
+        # Draw selection border and handles using axis-aligned rect (not rotated);
+        # antialiasing is pure overhead on these, so turn it off while drawing them
         if self.selected:
-            painter.setPen(QPen(QColor(200, 0, 0), 3))
+            painter.save()
+            painter.setRenderHint(QPainter.RenderHint.Antialiasing, False)
+            painter.setPen(QPen(get_color((200, 0, 0)), 3))
             painter.setBrush(QBrush(Qt.NoBrush))
             painter.drawRect(self.rect)
             
@@ -513,10 +729,63 @@ class Image:
             handle_size = 8
             painter.fillRect(self.rect.topLeft().x() - handle_size//2, 
                            self.rect.topLeft().y() - handle_size//2, 
-                           handle_size, handle_size, QColor(200, 0, 0))
+                           handle_size, handle_size, get_color((200, 0, 0)))
             painter.fillRect(self.rect.bottomRight().x() - handle_size//2, 
                            self.rect.bottomRight().y() - handle_size//2, 
-                           handle_size, handle_size, QColor(200, 0, 0))
+                           handle_size, handle_size, get_color((200, 0, 0)))
+            painter.restore()
+
+    def _get_scaled_pixmap(self):
+        """Get the pixmap resampled to the image's size, rescaling only after a resize"""
+        key = (int(self.width), int(self.height))
+        if key != self._scaled_key:
+            scaled_pixmap = Image._get_sized((self.image_path,) + key)
+            if scaled_pixmap is None:
+                # Scale pixmap to fit within the specified width and height while maintaining aspect ratio
+                scaled_pixmap = self.pixmap.scaledToWidth(key[0], Qt.SmoothTransformation)
+                # If scaled height exceeds desired height, scale by height instead
+                if scaled_pixmap.height() > key[1]:
+                    scaled_pixmap = self.pixmap.scaledToHeight(key[1], Qt.SmoothTransformation)
+                Image._put_sized((self.image_path,) + key, scaled_pixmap)
+            self._scaled_pixmap = scaled_pixmap
+            self._scaled_key = key
+        return self._scaled_pixmap
+
+    @staticmethod
+    def _get_sized(key):
+        """Get a shared sized pixmap, if one was made for the key"""
+        return Image._sized_cache.get(key)
+
+    @staticmethod
+    def _put_sized(key, pixmap):
+        """Share a sized pixmap with other images of the same file and size"""
+        if len(Image._sized_cache) >= Image.SIZED_CACHE_LIMIT:
+            Image._sized_cache.clear()
+        Image._sized_cache[key] = pixmap
+
+    def _get_svg_pixmap(self, scale):
+        """Get the SVG rendered at device resolution, or None if it would be too large to cache"""
+        width, height = int(self.width), int(self.height)
+        scale = round(scale, 3)
+        pixel_width = math.ceil(width * scale)
+        pixel_height = math.ceil(height * scale)
+        if not 0 < pixel_width <= self.SVG_CACHE_MAX_SIZE or not 0 < pixel_height <= self.SVG_CACHE_MAX_SIZE:
+            return None
+        key = (width, height, scale)
+        if key != self._scaled_key:
+            # Re-render the vector data only when the size or zoom changes
+            pixmap = Image._get_sized((self.image_path,) + key)
+            if pixmap is None:
+                pixmap = QPixmap(pixel_width, pixel_height)
+                pixmap.fill(Qt.GlobalColor.transparent)
+                pixmap_painter = QPainter(pixmap)
+                pixmap_painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+                self.svg_renderer.render(pixmap_painter, QRectF(0, 0, pixel_width, pixel_height))
+                pixmap_painter.end()
+                Image._put_sized((self.image_path,) + key, pixmap)
+            self._scaled_pixmap = pixmap
+            self._scaled_key = key
+        return self._scaled_pixmap
 
     def to_dict(self):
         """Convert image to dictionary for JSON serialization"""
@@ -527,7 +796,7 @@ class Image:
             "width": self.width,
             "height": self.height,
             "rotation": self.rotation,
-            "module_instance_id": getattr(self, 'module_instance_id', None)
+            "module_instance_id": self.module_instance_id
         }
 
     @staticmethod
@@ -4,6 +4,7 @@ File handler for saving and loading wire diagram files in JSON format
 
 import json
 import os
+import tempfile
 from pathlib import Path
 from PyQt5.QtWidgets import QFileDialog, QMessageBox
 
@@ -44,19 +45,31 @@ class DiagramFileHandler:
         )
         return file_path if file_path else None
 
-    def save_diagram(self, file_path, diagram_data):
-        """Save diagram data to a JSON file"""
+    def save_diagram_stream(self, file_path, write_diagram):
+        """Save a diagram by letting write_diagram stream JSON into the file"""
         try:
             # Ensure the file has .json extension
             if not file_path.endswith('.json'):
                 file_path += '.json'
-            
-            print(f"[DEBUG save_diagram] Saving {len(diagram_data.get('nodes', []))} nodes, {len(diagram_data.get('images', []))} images to {file_path}")
-            nodes_with_modules = [n for n in diagram_data.get('nodes', []) if n.get('module_id')]
-            print(f"  - {len(nodes_with_modules)} nodes have module_id")
 
-            with open(file_path, 'w') as f:
-                json.dump(diagram_data, f, indent=2)
+            # Write to a temp file beside the target so a failed save leaves the previous file intact
+            directory = os.path.dirname(os.path.abspath(file_path))
+            fd, temp_path = tempfile.mkstemp(suffix='.tmp', dir=directory)
+            try:
+                with os.fdopen(fd, 'w') as f:
+                    write_diagram(f)
+                # mkstemp creates the file owner-only; keep the existing file's mode, or honour the umask
+                if os.path.exists(file_path):
+                    mode = os.stat(file_path).st_mode
+                else:
+                    umask = os.umask(0)
+                    os.umask(umask)
+                    mode = 0o666 & ~umask
+                os.chmod(temp_path, mode)
+                os.replace(temp_path, file_path)
+            except BaseException:
+                os.remove(temp_path)
+                raise
 
             self.current_file = file_path
             return True, f"Diagram saved to {os.path.basename(file_path)}"
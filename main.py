@@ -9,13 +9,13 @@ from PyQt5.QtWidgets import (
     QInputDialog, QListWidget, QListWidgetItem, QDialog, QLabel, QFileDialog
 )
 from PyQt5.QtCore import Qt, QPoint, QSize, QRect
-from PyQt5.QtGui import QIcon, QColor, QPainter, QPen, QBrush
+from PyQt5.QtGui import QIcon, QPainter, QPen, QBrush
 from diagram_canvas import DiagramCanvas
 from file_handler import DiagramFileHandler
 from module_handler import ModuleHandler
 from module_dialog import ModuleCreationDialog
 from preferences_dialog import PreferencesDialog
-from diagram_elements import Module, Node
+from diagram_elements import Module, Node, get_color
 from properties_panel import PropertiesPanel
 from config_loader import get_config
 
@@ -408,11 +408,13 @@ class WireDiagramMaker(QMainWindow):
             elif not is_orthogonal:
                 # Clear waypoints for direct routing
                 connection.waypoints = []
+        self.canvas.invalidate_indexes()
         self.canvas.diagram_modified.emit()
         self.canvas.update()
 
     def on_image_rotated(self):
         """Handle image rotation from properties panel"""
+        self.canvas.invalidate_indexes()
         self.canvas.update()
         self.canvas.diagram_modified.emit()
 
@@ -421,16 +423,12 @@ class WireDiagramMaker(QMainWindow):
         module_id = self.properties_panel.selected_module_id
         if module_id:
             self.canvas.rotate_module(module_id, 1)  # 1 for clockwise
-            self.canvas.update()
-            self.canvas.diagram_modified.emit()
 
     def on_module_rotated_ccw(self):
         """Handle module rotation counter-clockwise from properties panel"""
         module_id = self.properties_panel.selected_module_id
         if module_id:
             self.canvas.rotate_module(module_id, -1)  # -1 for counter-clockwise
-            self.canvas.update()
-            self.canvas.diagram_modified.emit()
 
     def on_module_edit_saved(self):
         """Handle module edit save"""
@@ -457,8 +455,8 @@ class WireDiagramMaker(QMainWindow):
     def update_properties_panel(self):
         """Update properties panel with current selection"""
         self.properties_panel.set_selected_elements(
-            self.canvas.selected_nodes,
-            self.canvas.selected_connections,
+            self.canvas.get_selected_nodes(),
+            self.canvas.get_selected_connections(),
             self.canvas.get_selected_images()
         )
         # Show edit controls if in module edit mode
@@ -633,8 +631,7 @@ class WireDiagramMaker(QMainWindow):
 
     def save_to_file(self, file_path):
         """Save diagram to a specific file"""
-        diagram_data = self.canvas.export_diagram()
-        success, message = self.file_handler.save_diagram(file_path, diagram_data)
+        success, message = self.file_handler.save_diagram_stream(file_path, self.canvas.export_diagram_stream)
         if success:
             self.statusBar().showMessage(message)
             self.diagram_modified = False
@@ -676,12 +673,8 @@ class WireDiagramMaker(QMainWindow):
     
     def on_preferences_saved(self):
         """Handle preferences saved signal - refresh UI"""
-        # Refresh all nodes from updated config
-        for node in self.canvas.nodes:
-            node.refresh_from_config()
-        
-        # Refresh canvas
-        self.canvas.update()
+        # Refresh nodes and cached renderings from updated config
+        self.canvas.refresh_from_config()
         self.statusBar().showMessage("Preferences saved and reloaded successfully")
 
     def on_about(self):
@@ -696,10 +689,8 @@ class WireDiagramMaker(QMainWindow):
 
     def on_create_module(self):
         """Create a module from selected nodes"""
-        # Get selected nodes
-        selected_nodes = [node for node in self.canvas.nodes if node.selected]
-        
-        if not selected_nodes:
+        # Check for selected nodes; the dialog collects them itself
+        if not self.canvas.selected_nodes:
             QMessageBox.warning(self, "No Selection", "Please select at least one node to create a module.")
             return
         
@@ -759,12 +750,9 @@ class WireDiagramMaker(QMainWindow):
             module = self.module_handler.load_module(module_id)
             
             if module:
-                # Count how many instances of this module already exist
-                # Look for nodes with module_id pattern: "original_id_inst_1", "original_id_inst_2", etc.
-                existing_instances = len([n for n in self.canvas.nodes if hasattr(n, 'module_id') and n.module_id and n.module_id.startswith(f"{module_id}_inst_")])
-                
-                # Create a UNIQUE instance ID for this loaded instance
-                instance_number = existing_instances + 1
+                # Create a UNIQUE instance ID for this loaded instance, following
+                # the existing "original_id_inst_1", "original_id_inst_2", etc.
+                instance_number = self.canvas.get_next_instance_number(module_id)
                 unique_instance_id = f"{module_id}_inst_{instance_number}"
                 
                 # Get the center of the current viewport
@@ -800,7 +788,7 @@ class WireDiagramMaker(QMainWindow):
                     )
                     # Copy all properties
                     new_node.node_class = node.node_class
-                    new_node.color = QColor(node.color.red(), node.color.green(), node.color.blue())
+                    new_node.color = get_color((node.color.red(), node.color.green(), node.color.blue()))
                     new_node.module_id = unique_instance_id  # Each instance gets a unique ID!
                     new_node.locked = True
                     self.canvas.nodes.append(new_node)
@@ -822,6 +810,7 @@ class WireDiagramMaker(QMainWindow):
                     new_image.module_instance_id = unique_instance_id
                     self.canvas.images.append(new_image)
                 
+                self.canvas.invalidate_indexes()
                 self.canvas.update()
                 self.statusBar().showMessage(f"Module '{module.name}' (instance {instance_number}) loaded successfully!")
                 dialog.accept()
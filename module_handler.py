@@ -70,6 +70,24 @@ class ModuleHandler:
         
         return modules_list
 
+    def get_module_name(self, module_id):
+        """Get the name of a saved module, or None if it cannot be found"""
+        # Modules are saved as <id>.json, so only that file normally needs reading
+        file_path = self.modules_dir / f"{module_id}.json"
+        if file_path.exists():
+            try:
+                with open(file_path, "r") as f:
+                    module_dict = json.load(f)
+                return module_dict.get("name", file_path.stem)
+            except Exception as e:
+                print(f"Error reading module file {file_path}: {e}")
+        
+        # Fall back to scanning every module file (e.g. one that was renamed)
+        for mod_info in self.get_available_modules():
+            if mod_info["id"] == module_id:
+                return mod_info["name"]
+        return None
+
     def delete_module(self, module_id):
         """Delete a module file"""
         try:
@@ -3,6 +3,7 @@ Preferences/Settings dialog for configuring application settings
 """
 
 import json
+from functools import partial
 from pathlib import Path
 from PyQt5.QtWidgets import (
     QDialog, QVBoxLayout, QHBoxLayout, QLabel, QSpinBox, QCheckBox,
@@ -186,10 +187,10 @@ class PreferencesDialog(QDialog):
             color = cls['color']
             self.set_button_color(color_button, color)
             color_data = (color, row)  # Store color and row index
-            color_button.clicked.connect(lambda checked, cb=color_button, r=row: self.choose_class_color(cb, r))
+            color_button.clicked.connect(partial(self.choose_class_color, color_button, row))
             self.classes_table.setCellWidget(row, 1, color_button)
 
-    def choose_class_color(self, button, row):
+    def choose_class_color(self, button, row, checked=False):
         """Open color picker for a node class"""
         color = self.config_data['node']['classes'][row]['color']
         color_dialog = QColorDialog(QColor(*color), self)
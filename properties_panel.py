@@ -364,12 +364,12 @@ class PropertiesPanel(QWidget):
         # Check if all selected nodes belong to the same module
         module_id = None
         is_module = False
-        if nodes and all(getattr(node, 'locked', False) and hasattr(node, 'module_id') and node.module_id for node in nodes):
-            # Check if all nodes have the same module_id
-            module_ids = set(node.module_id for node in nodes if hasattr(node, 'module_id'))
-            if len(module_ids) == 1:
-                module_id = module_ids.pop()
-                is_module = True
+        if nodes and nodes[0].locked and nodes[0].module_id:
+            # Check in one pass that every node is locked into that same module
+            module_id = nodes[0].module_id
+            is_module = all(node.locked and node.module_id == module_id for node in nodes)
+            if not is_module:
+                module_id = None
 
         # Determine which panel to show
         if is_module and module_id:
@@ -423,11 +423,9 @@ class PropertiesPanel(QWidget):
         try:
             from module_handler import ModuleHandler
             handler = ModuleHandler()
-            modules = handler.get_available_modules()
-            for mod_info in modules:
-                if mod_info["id"] == base_module_id:
-                    module_name = mod_info["name"]
-                    break
+            found_name = handler.get_module_name(base_module_id)
+            if found_name:
+                module_name = found_name
         except:
             pass
         
@@ -0,0 +1,101 @@
+"""
+Spatial hash for finding diagram elements near a point or inside a rectangle
+"""
+
+import math
+
+
+class SpatialHash:
+    """Uniform grid that maps each cell to the items whose bounds overlap it"""
+
+    def __init__(self, cell_size):
+        """Initialize an empty spatial hash"""
+        self.cell_size = cell_size
+        self._cells = {}  # {(cx, cy): set of items}
+        self._item_cells = {}  # {item: tuple of (cx, cy) it is stored in}
+        self._item_rects = {}  # {item: rectangle it was last stored with}
+        self._item_ranges = {}  # {item: (min_cx, min_cy, max_cx, max_cy) it covers}
+
+    def cell_range(self, rect):
+        """Get the inclusive (min_cx, min_cy, max_cx, max_cy) cell span of a rectangle"""
+        size = self.cell_size
+        return (
+            math.floor(rect.left() / size),
+            math.floor(rect.top() / size),
+            math.floor(rect.right() / size),
+            math.floor(rect.bottom() / size)
+        )
+
+    @staticmethod
+    def _cells_in_range(cell_range):
+        """Get the (cx, cy) keys of every cell in an inclusive cell range"""
+        min_cx, min_cy, max_cx, max_cy = cell_range
+        return tuple(
+            (cx, cy)
+            for cx in range(min_cx, max_cx + 1)
+            for cy in range(min_cy, max_cy + 1)
+        )
+
+    def insert(self, item, rect):
+        """Add an item covering the given rectangle"""
+        self._insert(item, rect, self.cell_range(rect))
+
+    def _insert(self, item, rect, cell_range):
+        """Add an item whose cell range is already known"""
+        cells = self._cells_in_range(cell_range)
+        self._item_cells[item] = cells
+        self._item_rects[item] = rect
+        self._item_ranges[item] = cell_range
+        for cell in cells:
+            bucket = self._cells.get(cell)
+            if bucket is None:
+                bucket = self._cells[cell] = set()
+            bucket.add(item)
+
+    def remove(self, item):
+        """Remove an item, if present"""
+        cells = self._item_cells.pop(item, None)
+        if cells is None:
+            return
+        del self._item_rects[item]
+        del self._item_ranges[item]
+        for cell in cells:
+            bucket = self._cells[cell]
+            bucket.discard(item)
+            if not bucket:
+                del self._cells[cell]
+
+    def update(self, item, rect):
+        """Move an item to a new rectangle, touching only cells that changed"""
+        # Small moves usually stay in the same cells; comparing the four range
+        # bounds avoids building the cell tuple at all in that case
+        cell_range = self.cell_range(rect)
+        if self._item_ranges.get(item) == cell_range:
+            self._item_rects[item] = rect
+            return
+        self.remove(item)
+        self._insert(item, rect, cell_range)
+
+    def query(self, rect):
+        """Get the set of items stored in any cell the rectangle touches"""
+        found = set()
+        min_cx, min_cy, max_cx, max_cy = self.cell_range(rect)
+        span = (max_cx - min_cx + 1) * (max_cy - min_cy + 1)
+        if span > len(self._cells):
+            # Zoomed far out: cheaper to walk the occupied cells than the span
+            for (cx, cy), bucket in self._cells.items():
+                if min_cx <= cx <= max_cx and min_cy <= cy <= max_cy:
+                    found.update(bucket)
+            return found
+        cells = self._cells
+        for cx in range(min_cx, max_cx + 1):
+            for cy in range(min_cy, max_cy + 1):
+                bucket = cells.get((cx, cy))
+                if bucket:
+                    found.update(bucket)
+        return found
+
+    def intersecting(self, rect):
+        """Get the items whose stored rectangle intersects the given one"""
+        rects = self._item_rects
+        return [item for item in self.query(rect) if rect.intersects(rects[item])]